@@ -3,8 +3,147 @@ Crane2S Protocol Generator
 
 This class provides a pure protocol implementation for constructing Crane 2S BLE control
 packets without any Bluetooth dependencies. You can use this in any language or framework
-to generate the exact byte payloads to send over your own BLE/UART/Socket layer.
+to generate the exact byte payloads to send over your own BLE/UART/Socket layer (or one of the
+pycrane2s.transport backends).
 """
+import struct
+
+from .crc import crc16_xmodem
+from .metrics import NULL_REGISTRY, MetricsRegistry
+
+PACKET_SIZE = 14
+
+# Bytes 0–5 never change: header 0x243C, length 8 (little-endian), format ID 0x1812
+HEADER = b"\x24\x3C\x08\x00\x18\x12"
+DIRECTION_APP_TO_GIMBAL = 0x01
+
+# Bytes 6–11: sequence, direction, command ID, value (LE), speed
+_BODY = struct.Struct('<BBBHB')
+# Bytes 12–13: CRC over bytes 4–11 (LE)
+_CRC = struct.Struct('<H')
+
+
+def encode_packet_into(buf, offset: int, seq: int, cmd_id: int, value: int, speed: int) -> int:
+    """
+    Write one 14-byte command packet into `buf` at `offset`.
+
+    `buf` must be a writable bytes-like object (bytearray, memoryview, ...).
+    Returns the offset just past the written packet.
+    """
+    end = offset + PACKET_SIZE
+    buf[offset:offset + 6] = HEADER
+    _BODY.pack_into(buf, offset + 6, seq, DIRECTION_APP_TO_GIMBAL, cmd_id & 0xFF,
+                    value & 0x0FFF, max(1, min(255, speed)))
+    _CRC.pack_into(buf, offset + 12, crc16_xmodem(memoryview(buf)[offset + 4:offset + 12]))
+    return end
+
+
+# CRC-16/XMODEM with a zero initial value is linear over GF(2), so the CRC of
+# bytes 4–11 equals the XOR of the CRCs of each field placed alone in an
+# otherwise zeroed 8-byte message. Per-field tables are built on first use.
+_composed = None
+
+
+def _composed_tables():
+    global _composed
+    if _composed is None:
+        def field_crc(pos: int, data: bytes) -> int:
+            msg = bytearray(8)
+            msg[pos:pos + len(data)] = data
+            return crc16_xmodem(msg)
+
+        # The constant format ID and direction byte are folded into the seq table
+        base = crc16_xmodem(HEADER[4:6] + bytes([0, DIRECTION_APP_TO_GIMBAL, 0, 0, 0, 0]))
+        seq_t = tuple(base ^ field_crc(2, bytes([i])) for i in range(256))
+        cmd_t = tuple(field_crc(4, bytes([i])) for i in range(256))
+        value_t = tuple(field_crc(5, v.to_bytes(2, 'little')) for v in range(0x1000))
+        speed_t = tuple(field_crc(7, bytes([i])) for i in range(256))
+        _composed = (seq_t, cmd_t, value_t, speed_t)
+    return _composed
+
+
+def encode_packet_into_composed(buf, offset: int, seq: int, cmd_id: int, value: int, speed: int) -> int:
+    """
+    Same as `encode_packet_into`, but assembles the CRC from precomputed per-field tables.
+
+    Costs four table lookups instead of a pass over the 8 checksummed bytes.
+    """
+    seq_t, cmd_t, value_t, speed_t = _composed or _composed_tables()
+    cmd_id &= 0xFF
+    value &= 0x0FFF
+    speed = max(1, min(255, speed))
+    end = offset + PACKET_SIZE
+    buf[offset:offset + 6] = HEADER
+    _BODY.pack_into(buf, offset + 6, seq, DIRECTION_APP_TO_GIMBAL, cmd_id, value, speed)
+    _CRC.pack_into(buf, offset + 12, seq_t[seq] ^ cmd_t[cmd_id] ^ value_t[value] ^ speed_t[speed])
+    return end
+
+
+# Below this many packets the pure-Python loop beats NumPy's per-call overhead
+_NUMPY_MIN_BATCH = 32
+_np = None
+_composed_np = None
+
+
+def _numpy():
+    """Import NumPy on first use; returns None when it is not installed."""
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _np = numpy
+    return _np or None
+
+
+def _build_many_numpy(np, seq0: int, cmd_ids, values, speeds) -> bytearray:
+    global _composed_np
+    if _composed_np is None:
+        _composed_np = tuple(np.array(t, dtype=np.uint16) for t in _composed_tables())
+    seq_t, cmd_t, value_t, speed_t = _composed_np
+
+    cmd, val, spd = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(cmd_ids, dtype=np.int64)) & 0xFF,
+        np.atleast_1d(np.asarray(values, dtype=np.int64)) & 0x0FFF,
+        np.clip(np.atleast_1d(np.asarray(speeds, dtype=np.int64)), 1, 255),
+    )
+    n = cmd.shape[0]
+    seq = (seq0 + np.arange(n)) & 0xFF
+    crc = seq_t[seq] ^ cmd_t[cmd] ^ value_t[val] ^ speed_t[spd]
+
+    buf = bytearray(n * PACKET_SIZE)
+    out = np.frombuffer(buf, dtype=np.uint8).reshape(n, PACKET_SIZE)
+    out[:, :6] = np.frombuffer(HEADER, dtype=np.uint8)
+    out[:, 6] = seq
+    out[:, 7] = DIRECTION_APP_TO_GIMBAL
+    out[:, 8] = cmd
+    out[:, 9] = val & 0xFF
+    out[:, 10] = val >> 8
+    out[:, 11] = spd
+    out[:, 12] = crc & 0xFF
+    out[:, 13] = crc >> 8
+    return buf
+
+
+def _as_column(x):
+    # Scalars are broadcast against the other columns
+    return x if hasattr(x, '__len__') else None
+
+
+# Stop and center commands (speed 1, and the default reset speed of 0.1 * 255).
+# Their cache entries are pinned: never evicted and not counted in max_cached.
+RESERVED_CACHE_KEYS = (
+    (0x02, 2048, 1), (0x01, 2048, 1),
+    (0x02, 2048, 25), (0x01, 2048, 25),
+)
+
+# Packet finalizers selectable through Crane2SProtocol(finalizer=...)
+FINALIZERS = {
+    'table': encode_packet_into,
+    'composed': encode_packet_into_composed,
+}
+
 
 class Crane2SProtocol:
     """
@@ -13,26 +152,42 @@ class Crane2SProtocol:
     Maintains an internal sequence ID that increments on each packet.
 
     Methods return a `bytes` object containing the 14-byte payload.
+
+    `finalizer` picks how the CRC is produced: 'table' runs the table-driven CRC
+    over bytes 4–11, 'composed' XORs precomputed per-field CRCs. Both produce
+    identical packets.
+
+    Pass a `MetricsRegistry` as `metrics` to count encoded packets.
     """
-    def __init__(self):
+    def __init__(self, finalizer: str = 'table', max_cached: int = 32,
+                 metrics: MetricsRegistry = None, labels: dict = None):
+        if finalizer not in FINALIZERS:
+            raise ValueError(f"finalizer must be one of {', '.join(FINALIZERS)}")
+        self.finalizer = finalizer
+        self._encode = FINALIZERS[finalizer]
         # Sequence ID cycles 0x00–0xFF
         self._seq = 0
+        # Reusable output buffer for build_cmd / build_cmd_view
+        self._buf = bytearray(HEADER + bytes(PACKET_SIZE - len(HEADER)))
+        self._view = memoryview(self._buf)
+        # (cmd_id, value, speed) -> 256 finalized packets indexed by seq, built on first use.
+        # Reserved keys live in _pinned; the rest in _cache, least recently used first.
+        self._pinned: dict[tuple[int, int, int], tuple[bytes, ...]] = {}
+        self._cache: dict[tuple[int, int, int], tuple[bytes, ...]] = {}
+        self.max_cached = max_cached
+        self._encoded = (metrics or NULL_REGISTRY).counter(
+            'crane2s_packets_encoded_total', "Command packets encoded", labels)
 
     def _next_seq(self) -> int:
         seq = self._seq
         self._seq = (self._seq + 1) & 0xFF
+        self._encoded.inc()
         return seq
 
     @staticmethod
     def _xmodem_crc16(data: bytes) -> int:
         """Compute CRC-16/XMODEM over the data."""
-        crc = 0x0000
-        for b in data:
-            crc ^= b << 8
-            for _ in range(8):
-                crc = ((crc << 1) ^ 0x1021) if (crc & 0x8000) else (crc << 1)
-                crc &= 0xFFFF
-        return crc
+        return crc16_xmodem(data)
 
     def build_cmd(self, cmd_id: int, value: int, speed: int) -> bytes:
         """
@@ -46,27 +201,124 @@ class Crane2SProtocol:
         Returns:
             14-byte command as bytes
         """
-        seq = self._next_seq()
-        # header
-        pkt = bytearray([0x24, 0x3C])
-        # length (little-endian 0x0008)
-        pkt += (8).to_bytes(2, 'little')
-        # format ID 0x1812
-        pkt += bytes.fromhex('1812')
-        # sequence
-        pkt.append(seq)
-        # direction: app→gimbal
-        pkt.append(0x01)
-        # command ID
-        pkt.append(cmd_id & 0xFF)
-        # value (12-bit, little-endian)
-        pkt += (value & 0x0FFF).to_bytes(2, 'little')
-        # speed byte
-        pkt.append(max(1, min(255, speed)))
-        # CRC over bytes 4–11
-        crc = self._xmodem_crc16(bytes(pkt[4:]))
-        pkt += crc.to_bytes(2, 'little')
-        return bytes(pkt)
+        self._encode(self._buf, 0, self._next_seq(), cmd_id, value, speed)
+        return bytes(self._buf)
+
+    def build_cmd_view(self, cmd_id: int, value: int, speed: int) -> memoryview:
+        """
+        Same as `build_cmd`, but returns a view of an internal buffer instead of a copy.
+
+        The view is only valid until the next `build_cmd`/`build_cmd_view` call.
+        """
+        self._encode(self._buf, 0, self._next_seq(), cmd_id, value, speed)
+        return self._view
+
+    def encode_into(self, buf, offset: int, cmd_id: int, value: int, speed: int) -> int:
+        """
+        Encode a command straight into a caller-supplied buffer.
+
+        Consumes a sequence number like `build_cmd`. Returns the offset just past
+        the packet, so consecutive calls can fill a batch buffer back to back.
+        """
+        return self._encode(buf, offset, self._next_seq(), cmd_id, value, speed)
+
+    def build_many(self, cmd_ids, values, speeds) -> memoryview:
+        """
+        Build a run of packets into one contiguous buffer.
+
+        Args:
+            cmd_ids, values, speeds: equal-length sequences or NumPy arrays; any
+                of them may also be a single int shared by every packet.
+
+        Returns:
+            memoryview over N×14 bytes. Packets get consecutive sequence numbers.
+            Use `packet_view` / `iter_packets` to get single packets without copying.
+        """
+        columns = [c for c in map(_as_column, (cmd_ids, values, speeds)) if c is not None]
+        n = len(columns[0]) if columns else 1
+        if any(len(c) != n for c in columns):
+            raise ValueError("cmd_ids, values and speeds must have the same length")
+
+        seq0 = self._seq
+        self._seq = (self._seq + n) & 0xFF
+        self._encoded.inc(n)
+
+        np = _numpy() if n >= _NUMPY_MIN_BATCH else None
+        if np is not None:
+            return memoryview(_build_many_numpy(np, seq0, cmd_ids, values, speeds))
+
+        cols = [c if hasattr(c, '__len__') else [c] * n for c in (cmd_ids, values, speeds)]
+        buf = bytearray(n * PACKET_SIZE)
+        offset = 0
+        for i, (cmd_id, value, speed) in enumerate(zip(*cols)):
+            offset = encode_packet_into_composed(buf, offset, (seq0 + i) & 0xFF,
+                                                 int(cmd_id), int(value), int(speed))
+        return memoryview(buf)
+
+    @staticmethod
+    def packet_view(batch, index: int) -> memoryview:
+        """Zero-copy view of packet `index` inside a `build_many` buffer."""
+        count = len(batch) // PACKET_SIZE
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("packet index out of range")
+        start = index * PACKET_SIZE
+        return memoryview(batch)[start:start + PACKET_SIZE]
+
+    @staticmethod
+    def iter_packets(batch):
+        """Yield zero-copy views of each packet inside a `build_many` buffer."""
+        mv = memoryview(batch)
+        for start in range(0, len(mv) - PACKET_SIZE + 1, PACKET_SIZE):
+            yield mv[start:start + PACKET_SIZE]
+
+    def cached_cmd(self, cmd_id: int, value: int, speed: int) -> bytes:
+        """
+        Same packet as `build_cmd`, looked up from a per-command cache.
+
+        The first call for a (cmd_id, value, speed) finalizes all 256 sequence
+        variants (about 1 ms); later calls are a tuple lookup. Meant for commands
+        that repeat constantly (stop, center, keepalive re-sends). The stop and
+        center commands in `RESERVED_CACHE_KEYS` are always cached (see
+        `warm_cache`); other commands share `max_cached` slots, least recently
+        used first out.
+        """
+        key = (cmd_id & 0xFF, value & 0x0FFF, max(1, min(255, speed)))
+        packets = self._pinned.get(key)
+        if packets is None:
+            if key in RESERVED_CACHE_KEYS:
+                packets = self._pinned[key] = self._build_cache(*key)
+            else:
+                cache = self._cache
+                packets = cache.pop(key, None)
+                if packets is None:
+                    if self.max_cached <= 0:
+                        return self.build_cmd(cmd_id, value, speed)
+                    if len(cache) >= self.max_cached:
+                        del cache[next(iter(cache))]
+                    packets = self._build_cache(*key)
+                # Re-inserted at the end: most recently used
+                cache[key] = packets
+        return packets[self._next_seq()]
+
+    def warm_cache(self):
+        """Build the reserved stop/center cache entries now, so the first stop pays nothing."""
+        for key in RESERVED_CACHE_KEYS:
+            if key not in self._pinned:
+                self._pinned[key] = self._build_cache(*key)
+
+    def _build_cache(self, cmd_id: int, value: int, speed: int) -> tuple[bytes, ...]:
+        buf = bytearray(256 * PACKET_SIZE)
+        for seq in range(256):
+            self._encode(buf, seq * PACKET_SIZE, seq, cmd_id, value, speed)
+        return tuple(bytes(buf[i:i + PACKET_SIZE]) for i in range(0, len(buf), PACKET_SIZE))
+
+    @staticmethod
+    def decoder(max_length: int = 64):
+        """Create a streaming `FrameDecoder` for packets received from the gimbal."""
+        from .decoder import FrameDecoder
+        return FrameDecoder(max_length)
 
     # Convenience methods
     def pan(self, value: int, speed: int) -> bytes:
@@ -111,11 +363,12 @@ class Crane2SProtocol:
 
     def stop(self) -> list[bytes]:
         """Generate stop commands for pan and tilt (centered)."""
-        return [self.pan(2048, 1), self.tilt(2048, 1)]
+        return [self.cached_cmd(0x02, 2048, 1), self.cached_cmd(0x01, 2048, 1)]
 
     def reset_position(self, speed_pct: float = 0.1) -> list[bytes]:
         """Center gimbal to 0,0 with given speed percentage."""
-        return [self.pan_pct(0.0, speed_pct), self.tilt_pct(0.0, speed_pct)]
+        spd = int(max(1, min(255, speed_pct * 255)))
+        return [self.cached_cmd(0x02, 2048, spd), self.cached_cmd(0x01, 2048, spd)]
 
 # Example usage (no BLE):
 # pb = Crane2SProtocol()
@@ -1,2 +1,51 @@
-from .Crane2S import *
-from .constants import *
\ No newline at end of file
+"""
+Control over the Zhiyun Crane 2S gimbal.
+
+The packet encoder and constants are cheap and imported eagerly. Everything that
+pulls in asyncio or bleak is resolved on first attribute access, so protocol-only
+users can `from pycrane2s import Crane2SProtocol` without loading the BLE stack.
+`TelemetryHistory` needs the optional NumPy dependency and is left out of
+`from pycrane2s import *`.
+"""
+import importlib
+
+from .Crane2SProtocol import Crane2SProtocol
+from .constants import *
+
+# name -> submodule that defines it, imported on first access
+_LAZY = {
+    'Crane2S': '.main',
+    'Crane2SPresets': '.main',
+    'Crane2SFleet': '.fleet',
+    'PacketLog': '.packetlog',
+    'MetricsRegistry': '.metrics',
+    'serve_metrics': '.metrics',
+    'TelemetryHistory': '.history',
+    'Transport': '.transport',
+    'BleakTransport': '.transport',
+    'SerialTransport': '.transport',
+    'UdpTransport': '.transport',
+    'LoopbackTransport': '.transport',
+    'SimulatedGimbal': '.sim',
+    'CommandDropped': '.writer',
+    'VirtualTimeLoop': '.clock',
+    'run_virtual': '.clock',
+}
+
+# Names that need optional dependencies; importable, but not part of `import *`
+_OPTIONAL = {'TelemetryHistory'}
+
+__all__ = ['Crane2SProtocol', 'WRITE_UUID', 'NOTIFY_UUID', *(n for n in _LAZY if n not in _OPTIONAL)]
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | set(__all__))
@@ -0,0 +1,297 @@
+"""
+Benchmarks for pycrane2s.
+
+Run with `python -m pycrane2s.bench [name ...]`. Results are printed as JSON so
+runs from different versions can be compared. Nothing here needs a gimbal:
+sending runs over the loopback transport, and the latency benchmarks use the
+simulator in real time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from .Crane2SProtocol import Crane2SProtocol
+from .crc import crc16_xmodem, crc16_xmodem_many
+from .metrics import Histogram
+
+# Parent directory of the package, so child interpreters import this checkout
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORT_SNIPPET = """\
+import sys, time
+t = time.perf_counter()
+import pycrane2s
+pycrane2s.{attr}
+dt = time.perf_counter() - t
+print(dt, int('bleak' in sys.modules), int('asyncio' in sys.modules))
+"""
+
+
+def _time_import(attr: str, repeat: int) -> dict:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [_ROOT, env.get('PYTHONPATH')]))
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', _IMPORT_SNIPPET.format(attr=attr)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        times.append(float(out[0]))
+    return {
+        'median_ms': statistics.median(times) * 1e3,
+        'min_ms': min(times) * 1e3,
+        'loads_bleak': out[1] == '1',
+        'loads_asyncio': out[2] == '1',
+    }
+
+
+def bench_import(repeat: int = 5) -> dict:
+    """Cold import time of the package, for protocol-only and BLE client users."""
+    return {
+        'protocol': _time_import('Crane2SProtocol', repeat),
+        'client': _time_import('Crane2S', repeat),
+    }
+
+
+def _per_second(fn, number: int, repeat: int = 5) -> float:
+    # Best of `repeat` runs of `number` calls
+    best = min(_timed(fn, number) for _ in range(repeat))
+    return number / best
+
+
+def _timed(fn, number: int) -> float:
+    t = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - t
+
+
+def bench_encode(number: int = 100_000) -> dict:
+    """Packets per second for each way of encoding a command."""
+    from .main import Crane2S
+
+    protocol = Crane2SProtocol()
+    composed = Crane2SProtocol(finalizer='composed')
+    gimbal = Crane2S('bench', protocol=Crane2SProtocol())
+    batch = number // 100
+    cmds = [0x02] * batch
+    values = list(range(batch))
+    speeds = [10] * batch
+    return {
+        'build_cmd_pps': _per_second(lambda: protocol.build_cmd(0x02, 3000, 10), number),
+        'build_cmd_composed_pps': _per_second(lambda: composed.build_cmd(0x02, 3000, 10), number),
+        'build_cmd_view_pps': _per_second(lambda: protocol.build_cmd_view(0x02, 3000, 10), number),
+        'cached_cmd_pps': _per_second(lambda: protocol.cached_cmd(0x02, 3000, 10), number),
+        'client_build_cmd_pps': _per_second(lambda: gimbal._build_cmd(0x02, 3000, 10), number),
+        'build_many_pps': batch * _per_second(lambda: protocol.build_many(cmds, values, speeds), 100),
+    }
+
+
+def bench_crc(number: int = 100_000) -> dict:
+    """CRC-16/XMODEM throughput on packet bodies and on a large buffer."""
+    body = bytes(range(8))
+    block = bytes(range(256)) * 16
+    batch = Crane2SProtocol().build_many([0x02] * 1000, range(1000), [10] * 1000)
+    return {
+        'body_per_second': _per_second(lambda: crc16_xmodem(body), number),
+        'block_mb_per_second': len(block) * _per_second(lambda: crc16_xmodem(block), 200) / 1e6,
+        'many_per_second': 1000 * _per_second(lambda: crc16_xmodem_many(batch, 1000), 100),
+    }
+
+
+async def _connected(**kwargs):
+    from .main import Crane2S
+    from .transport import LoopbackTransport
+
+    sim = kwargs.pop('sim', None)
+    transport = sim.transport if sim is not None else LoopbackTransport(keep=0)
+    gimbal = Crane2S('bench', transport=transport, **kwargs)
+    await gimbal.connect()
+    return gimbal
+
+
+async def _send(number: int) -> dict:
+    gimbal = await _connected()
+    t = time.perf_counter()
+    for i in range(number):
+        await gimbal.send_cmd(0x02, i & 0x0FFF, 10)
+    single = time.perf_counter() - t
+    cmds = [(0x02, i & 0x0FFF, 10) for i in range(number)]
+    t = time.perf_counter()
+    await gimbal.send_cmds(cmds)
+    batched = time.perf_counter() - t
+    await gimbal.disconnect()
+    return {'send_cmd_pps': number / single, 'send_cmds_pps': number / batched}
+
+
+def bench_send(number: int = 20_000) -> dict:
+    """End-to-end send throughput through the writer task to the loopback transport."""
+    return asyncio.run(_send(number))
+
+
+async def _ticks(rate_hz: float, duration: float) -> dict:
+    gimbal = await _connected(motion_rate=rate_hz)
+    gimbal.scheduler.reset_stats()
+    await gimbal.pan(3000, 10, duration)
+    stats = gimbal.scheduler.stats
+    await gimbal.disconnect()
+    return {'rate_hz': rate_hz, 'duration': duration, **stats}
+
+
+def bench_ticks(rate_hz: float = 50.0, duration: float = 2.0) -> dict:
+    """Lateness of continuous-motion ticks on the real clock (seconds)."""
+    return asyncio.run(_ticks(rate_hz, duration))
+
+
+async def _heartbeat(duration: float, interval: float) -> dict:
+    from .sim import SimulatedGimbal
+
+    sim = SimulatedGimbal(heartbeat_interval=interval, heartbeat_timeout=10 * interval)
+    gimbal = await _connected(sim=sim)
+
+    async def load():
+        # Keep the writer busy with a steady stream of commands
+        i = 0
+        while True:
+            await gimbal.send_cmd(0x02, i & 0x0FFF, 10)
+            i += 1
+            if not i % 64:
+                await asyncio.sleep(0)
+
+    task = asyncio.get_running_loop().create_task(load())
+    await asyncio.sleep(duration)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    commands = sim.commands
+    await gimbal.disconnect()
+    return {
+        'commands_per_second': commands / duration,
+        'heartbeats_sent': sim.heartbeats_sent,
+        'heartbeats_echoed': sim.heartbeats_echoed,
+        'heartbeats_missed': sim.heartbeats_missed,
+        # Notification arrival to echo written, inside the client
+        'client_latency': gimbal.link_metrics()['heartbeat_echo_latency'],
+        # Heartbeat sent to echo received, at the simulated gimbal
+        'round_trip': sim.echo_latency.snapshot(),
+    }
+
+
+def bench_heartbeat(duration: float = 2.0, interval: float = 0.01) -> dict:
+    """Heartbeat echo latency while the link is saturated with commands."""
+    return asyncio.run(_heartbeat(duration, interval))
+
+
+async def _motion(trials: int) -> dict:
+    from .sim import SimulatedGimbal
+
+    sim = SimulatedGimbal(heartbeat_interval=None)
+    gimbal = await _connected(sim=sim)
+    applied = Histogram()
+    started = None
+
+    def on_command(msg, now):
+        # Only the first command of each trial; later ones are tick re-sends
+        nonlocal started
+        if started is not None:
+            applied.record(time.perf_counter_ns() - started)
+            started = None
+
+    sim.on_command = on_command
+    for i in range(trials):
+        started = time.perf_counter_ns()
+        handle = gimbal.pan(1024 if i % 2 else 3072, 255, None)
+        await asyncio.sleep(0.005)
+        handle.cancel()
+    await gimbal.disconnect()
+    return {'trials': trials, 'latency': applied.snapshot()}
+
+
+def bench_motion(trials: int = 200) -> dict:
+    """Time from `Crane2S.pan()` to the simulated gimbal applying the command."""
+    return asyncio.run(_motion(trials))
+
+
+async def _fleet(units: int, duration: float, rate_hz: float) -> dict:
+    from .fleet import Crane2SFleet
+    from .main import Crane2S
+    from .sim import SimulatedGimbal
+
+    sims = [SimulatedGimbal(latency=0.005, jitter=0.002, seed=i) for i in range(units)]
+    fleet = Crane2SFleet([Crane2S(f"sim-{i}", transport=s.transport) for i, s in enumerate(sims)])
+    await fleet.connect()
+    clock = asyncio.get_running_loop()
+    cpu = time.process_time()
+    end = clock.time() + duration
+    k = 0
+    while clock.time() < end:
+        await fleet.broadcast(0x02, 1024 + (k & 1023), 10)
+        k += 1
+        await asyncio.sleep(1 / rate_hz)
+    cpu = time.process_time() - cpu
+    health = fleet.health()
+    await fleet.disconnect()
+    return {
+        'units': units,
+        'commands': sum(s.commands for s in sims),
+        'heartbeats_missed': sum(s.heartbeats_missed for s in sims),
+        'healthy': sum(h['connected'] and not h['error'] for h in health.values()),
+        'cpu_seconds': cpu,
+        # CPU per unit per simulated second; flat if the fleet scales linearly
+        'cpu_per_unit_second': cpu / (units * duration),
+    }
+
+
+def bench_fleet(sizes=(1, 10, 50), duration: float = 10.0, rate_hz: float = 20.0) -> dict:
+    """
+    Load test: broadcast at `rate_hz` to fleets of simulated gimbals.
+
+    Runs on virtual time, so only CPU is measured and `duration` costs no wall-clock time.
+    """
+    from .clock import run_virtual
+
+    return {str(n): run_virtual(_fleet(n, duration, rate_hz)) for n in sizes}
+
+
+BENCHMARKS = {
+    'import': bench_import,
+    'encode': bench_encode,
+    'crc': bench_crc,
+    'send': bench_send,
+    'ticks': bench_ticks,
+    'heartbeat': bench_heartbeat,
+    'motion': bench_motion,
+    'fleet': bench_fleet,
+}
+
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(prog='python -m pycrane2s.bench', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('-o', '--output', help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {
+        'python': sys.version.split()[0],
+        'results': {name: BENCHMARKS[name]() for name in (args.names or BENCHMARKS)},
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Clocks for motion scheduling, and a virtual-time event loop.
+
+Everything in Crane2S that waits or schedules (the tick scheduler, motion
+timers, the presets' dwell times) goes through a `Clock`. The default `Clock`
+follows the running event loop, so it is real time on a normal loop and
+virtual time on a `VirtualTimeLoop`:
+
+    run_virtual(program())   # a 10-minute sweep finishes in milliseconds
+
+The virtual loop never sleeps. When nothing is ready to run, it jumps its
+clock straight to the next timer, so the same program makes the same
+scheduling decisions in the same order on every run.
+
+Measurements of the host itself (write latencies, heartbeat echo times,
+history timestamps) keep using `time.monotonic_ns()`.
+"""
+import asyncio
+import selectors
+
+
+class Clock:
+    """Time source of the running event loop (seconds)."""
+    def time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    def call_later(self, delay: float, callback, *args) -> asyncio.TimerHandle:
+        return asyncio.get_running_loop().call_later(delay, callback, *args)
+
+
+LOOP_CLOCK = Clock()
+
+
+class ScaledClock(Clock):
+    """
+    Loop clock running `factor` times faster (or slower, factor < 1).
+
+    Useful to speed up long programs against a real device simulator without
+    a virtual loop; timing jitter is scaled up by the same factor.
+    """
+    def __init__(self, factor: float):
+        if factor <= 0:
+            raise ValueError("factor must be positive")
+        self.factor = factor
+
+    def time(self) -> float:
+        return asyncio.get_running_loop().time() * self.factor
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds / self.factor)
+
+    def call_later(self, delay: float, callback, *args) -> asyncio.TimerHandle:
+        return asyncio.get_running_loop().call_later(delay / self.factor, callback, *args)
+
+
+class _VirtualSelector:
+    # Polls real I/O without blocking and advances the loop clock instead of waiting
+    def __init__(self, loop: "VirtualTimeLoop", selector: selectors.BaseSelector):
+        self._loop = loop
+        self._selector = selector
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if events:
+            return events
+        if timeout is None:
+            # No timers at all: only outside I/O can wake us, so really wait for it
+            return self._selector.select(None)
+        if timeout > 0:
+            self._loop._now += timeout
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop on virtual time.
+
+    `time()` starts at 0 and only moves when every task is waiting on a timer;
+    it then jumps to that timer. Real I/O still works, but is polled and never waited on
+    while timers are pending.
+    """
+    def __init__(self):
+        self._now = 0.0
+        super().__init__(_VirtualSelector(self, selectors.DefaultSelector()))
+
+    def time(self) -> float:
+        return self._now
+
+
+def run_virtual(main):
+    """Like `asyncio.run`, on a fresh `VirtualTimeLoop`."""
+    loop = VirtualTimeLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
@@ -0,0 +1,62 @@
+"""
+CRC-16/XMODEM used by every Crane 2S packet.
+
+The checksum (poly 0x1021, init 0x0000, no reflection) covers bytes 4–11 of a
+packet and is appended little-endian in bytes 12–13. A 256-entry table is built
+once at import so each byte costs a single lookup instead of 8 shift rounds.
+"""
+
+POLY = 0x1021
+
+
+def _make_table() -> tuple[int, ...]:
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ POLY) if (crc & 0x8000) else (crc << 1)
+            crc &= 0xFFFF
+        table.append(crc)
+    return tuple(table)
+
+
+TABLE = _make_table()
+
+
+def crc16_xmodem(data, crc: int = 0x0000) -> int:
+    """
+    Compute CRC-16/XMODEM over `data` (any bytes-like object).
+
+    Pass a previous result as `crc` to continue a running checksum.
+    """
+    table = TABLE
+    for b in data:
+        crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ b]
+    return crc
+
+
+def crc16_xmodem_many(buf, count: int, stride: int = 14, start: int = 4, length: int = 8) -> list[int]:
+    """
+    Compute the CRC of `count` fixed-size records laid out back to back in `buf`.
+
+    By default each record is a 14-byte Crane 2S packet and the CRC covers
+    bytes 4–11 of it, so this returns one checksum per packet.
+    """
+    table = TABLE
+    mv = memoryview(buf)
+    out = []
+    for i in range(count):
+        base = i * stride + start
+        crc = 0
+        for b in mv[base:base + length]:
+            crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ b]
+        out.append(crc)
+    return out
+
+
+def verify(pkt) -> bool:
+    """Check the trailing little-endian CRC of a complete packet (header at byte 0)."""
+    if len(pkt) < 6:
+        return False
+    mv = memoryview(pkt)
+    return crc16_xmodem(mv[4:-2]) == (mv[-2] | (mv[-1] << 8))
@@ -0,0 +1,145 @@
+"""
+Streaming decoder for packets received from the gimbal.
+
+Frames share the command layout: 0x24 0x3C, a little-endian length N, N bytes
+starting with the big-endian format ID, then a little-endian CRC-16/XMODEM of
+those N bytes. Notifications may carry partial or several frames; `FrameDecoder`
+reassembles them and returns typed messages whose fields reference the received
+data through memoryviews instead of copies.
+"""
+from typing import NamedTuple
+
+from .crc import crc16_xmodem
+
+SYNC = b"\x24\x3C"
+FORMAT_COMMAND = 0x1812
+FORMAT_HEARTBEAT = 0x1815
+
+
+class Message(NamedTuple):
+    """Frame of a format without a dedicated parser."""
+    format_id: int
+    payload: memoryview  # bytes after the format ID, before the CRC
+    raw: memoryview      # the whole frame
+
+
+class CommandMessage(NamedTuple):
+    """0x1812 motion command (what Crane2SProtocol produces)."""
+    seq: int
+    direction: int
+    cmd_id: int
+    value: int
+    speed: int
+    raw: memoryview
+
+    format_id = FORMAT_COMMAND
+
+
+class HeartbeatMessage(NamedTuple):
+    """0x1815 heartbeat; the app is expected to echo `raw` back."""
+    seq: int
+    payload: memoryview
+    raw: memoryview
+
+    format_id = FORMAT_HEARTBEAT
+
+
+def _parse_command(frame: memoryview, length: int):
+    if length != 8:
+        return None
+    return CommandMessage(frame[6], frame[7], frame[8], frame[9] | ((frame[10] & 0x0F) << 8), frame[11], frame)
+
+
+def _parse_heartbeat(frame: memoryview, length: int):
+    return HeartbeatMessage(frame[6] if length > 2 else -1, frame[6:4 + length], frame)
+
+
+# format ID -> parser(frame, length); unknown formats become a generic Message
+PARSERS = {
+    FORMAT_COMMAND: _parse_command,
+    FORMAT_HEARTBEAT: _parse_heartbeat,
+}
+
+
+class FrameDecoder:
+    """
+    Incremental frame decoder.
+
+    Call `feed(data)` with each notification; it returns the complete, CRC-valid
+    messages found so far. Bytes that cannot start a valid frame are skipped and
+    counted. Returned memoryviews stay valid as long as the caller does not
+    modify the buffer it passed in.
+
+    Args:
+        max_length: largest accepted length field; anything larger is treated
+            as garbage so a corrupt header cannot stall the stream
+    """
+    def __init__(self, max_length: int = 64):
+        self.max_length = max_length
+        self._pending = b""
+        self.frames = 0
+        self.crc_errors = 0
+        self.garbage_bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'crc_errors': self.crc_errors,
+            'garbage_bytes': self.garbage_bytes,
+            'pending_bytes': len(self._pending),
+        }
+
+    def reset(self):
+        """Drop any partially received frame."""
+        self._pending = b""
+
+    def feed(self, data) -> list:
+        # Only a split frame forces a copy; whole frames are parsed in place
+        if self._pending:
+            data = self._pending + bytes(data)
+        elif not hasattr(data, 'find'):
+            data = bytes(data)
+        mv = memoryview(data)
+        n = len(mv)
+        out = []
+        pos = 0
+        max_length = self.max_length
+        parsers = PARSERS
+        while True:
+            start = data.find(SYNC, pos)
+            if start < 0:
+                # Keep a trailing 0x24, it may be the first half of the next sync
+                keep = n - 1 if n > pos and mv[n - 1] == 0x24 else n
+                self.garbage_bytes += keep - pos
+                pos = keep
+                break
+            self.garbage_bytes += start - pos
+            if start + 4 > n:
+                pos = start
+                break
+            length = mv[start + 2] | (mv[start + 3] << 8)
+            if length < 2 or length > max_length:
+                self.garbage_bytes += 1
+                pos = start + 1
+                continue
+            end = start + 6 + length
+            if end > n:
+                pos = start
+                break
+            body = mv[start + 4:end - 2]
+            if crc16_xmodem(body) != (mv[end - 2] | (mv[end - 1] << 8)):
+                self.crc_errors += 1
+                pos = start + 1
+                continue
+
+            frame = mv[start:end]
+            format_id = (body[0] << 8) | body[1]
+            parser = parsers.get(format_id)
+            msg = parser(frame, length) if parser is not None else None
+            out.append(msg if msg is not None else Message(format_id, frame[6:end - start - 2], frame))
+            self.frames += 1
+            pos = end
+
+        self._pending = bytes(mv[pos:]) if pos < n else b""
+        return out
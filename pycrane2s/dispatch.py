@@ -0,0 +1,151 @@
+"""
+Per-message-type notification subscriptions for Crane2S.
+
+Subscribers are kept in a dict keyed by the format ID at bytes 4–5, so routing
+a notification is one dict lookup however many subscribers exist. Inline
+subscribers run inside the BLE callback and must be quick; subscribers
+registered with `offload=True` are handed the data through a bounded queue and
+run from a worker task, so a slow handler never holds up heartbeat echoing.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A registered callback; `cancel()` unsubscribes it."""
+    def __init__(self, dispatcher: "NotifyDispatcher", format_id, callback, offload: bool):
+        self._dispatcher = dispatcher
+        self.format_id = format_id
+        self.callback = callback
+        self.offload = offload
+        self.is_async = inspect.iscoroutinefunction(callback)
+        self.active = True
+        self.calls = 0
+        self.errors = 0
+        self.dropped = 0
+        # Time spent in the callback, ns
+        self.timing = Histogram()
+
+    def cancel(self):
+        self.active = False
+        self._dispatcher._remove(self)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'format_id': 'any' if self.format_id is None else f"0x{self.format_id:04x}",
+            'callback': getattr(self.callback, '__qualname__', repr(self.callback)),
+            'offload': self.offload,
+            'calls': self.calls,
+            'errors': self.errors,
+            'dropped': self.dropped,
+            'time': self.timing.snapshot(),
+        }
+
+
+class NotifyDispatcher:
+    """
+    Routes notifications to subscribers by format ID.
+
+    Args:
+        max_pending: bound of the offload queue; when full, the oldest pending
+            delivery is dropped and counted on its subscription
+    """
+    def __init__(self, max_pending: int = 256):
+        # format ID (or None for every notification) -> subscriptions
+        self._subs: dict = {}
+        self._pending = deque()
+        self.max_pending = max_pending
+        self._wakeup: asyncio.Event = None
+        self._task: asyncio.Task = None
+
+    def on(self, format_id, callback, offload: bool = False) -> Subscription:
+        """
+        Call `callback(data)` for every notification with `format_id` (None: all).
+
+        Coroutine functions are always offloaded.
+        """
+        sub = Subscription(self, format_id, callback, offload or inspect.iscoroutinefunction(callback))
+        # Tuples are replaced rather than mutated so dispatch can iterate without copying
+        self._subs[format_id] = self._subs.get(format_id, ()) + (sub,)
+        return sub
+
+    def _remove(self, sub: Subscription):
+        subs = tuple(s for s in self._subs.get(sub.format_id, ()) if s is not sub)
+        if subs:
+            self._subs[sub.format_id] = subs
+        else:
+            self._subs.pop(sub.format_id, None)
+
+    @property
+    def subscriptions(self) -> list[Subscription]:
+        return [s for subs in self._subs.values() for s in subs]
+
+    def dispatch(self, format_id: int, data):
+        for subs in (self._subs.get(format_id), self._subs.get(None)):
+            if not subs:
+                continue
+            for sub in subs:
+                if sub.offload:
+                    self._enqueue(sub, data)
+                else:
+                    self._call(sub, data)
+
+    def _call(self, sub: Subscription, data):
+        t0 = time.monotonic_ns()
+        try:
+            sub.callback(data)
+        except Exception:
+            sub.errors += 1
+            logger.exception("Notification subscriber %r failed", sub.callback)
+        sub.timing.record(time.monotonic_ns() - t0)
+        sub.calls += 1
+
+    def _enqueue(self, sub: Subscription, data):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()[0].dropped += 1
+        self._pending.append((sub, data))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            sub, data = self._pending.popleft()
+            if not sub.active:
+                continue
+            if not sub.is_async:
+                self._call(sub, data)
+                # Let the loop breathe between sync handlers
+                await asyncio.sleep(0)
+                continue
+            t0 = time.monotonic_ns()
+            try:
+                await sub.callback(data)
+            except Exception:
+                sub.errors += 1
+                logger.exception("Notification subscriber %r failed", sub.callback)
+            sub.timing.record(time.monotonic_ns() - t0)
+            sub.calls += 1
+
+    async def close(self):
+        """Stop the offload worker and drop pending deliveries."""
+        self._pending.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
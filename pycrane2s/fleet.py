@@ -0,0 +1,169 @@
+"""
+Several Crane 2S gimbals driven from one event loop.
+
+`Crane2SFleet` owns a set of `Crane2S` units keyed by name (their address by
+default). It connects them with bounded parallelism, broadcasts commands and
+reports the health of each unit. Each unit keeps its own protocol object, so a
+broadcast command is encoded once per unit with that unit's sequence number.
+A unit that fails never holds up or breaks the others.
+"""
+import asyncio
+import logging
+import time
+from typing import Iterable
+
+from .main import Crane2S
+from .motion import MotionHandle
+
+logger = logging.getLogger(__name__)
+
+
+class Crane2SFleet:
+    """
+    Args:
+        gimbals: the units; named by address unless given as a {name: Crane2S} dict
+        max_connecting: how many units may be connecting at the same time
+            (BLE adapters handle only a few concurrent connection attempts)
+    """
+    def __init__(self, gimbals: Iterable[Crane2S] | dict = (), max_connecting: int = 4):
+        self.max_connecting = max_connecting
+        self.units: dict[str, Crane2S] = {}
+        # name -> last connect/send error, cleared on success
+        self.errors: dict[str, BaseException] = {}
+        self.send_failures: dict[str, int] = {}
+        items = gimbals.items() if isinstance(gimbals, dict) else ((g.address, g) for g in gimbals)
+        for name, gimbal in items:
+            self.add(gimbal, name)
+
+    def add(self, gimbal: Crane2S, name: str = None):
+        name = gimbal.address if name is None else name
+        if name in self.units:
+            raise ValueError(f"Duplicate unit name {name!r}")
+        self.units[name] = gimbal
+        self.send_failures[name] = 0
+
+    def remove(self, name: str) -> Crane2S:
+        self.errors.pop(name, None)
+        self.send_failures.pop(name, None)
+        return self.units.pop(name)
+
+    def __getitem__(self, name: str) -> Crane2S:
+        return self.units[name]
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    def __iter__(self):
+        return iter(self.units)
+
+    @property
+    def connected(self) -> list[str]:
+        return [name for name, g in self.units.items() if g.transport.is_connected]
+
+    # For `async with ...`
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    async def connect(self, timeout: float = 10.0) -> dict[str, BaseException]:
+        """
+        Connect every unit that is not connected yet.
+
+        Returns the units that failed, with their errors; the others stay connected.
+        """
+        limit = asyncio.Semaphore(self.max_connecting)
+
+        async def connect_one(name: str, gimbal: Crane2S):
+            async with limit:
+                await gimbal.connect(timeout=timeout)
+
+        pending = [(n, g) for n, g in self.units.items() if not g.transport.is_connected]
+        results = await asyncio.gather(*(connect_one(n, g) for n, g in pending), return_exceptions=True)
+        failed = {}
+        for (name, _), result in zip(pending, results):
+            if isinstance(result, BaseException):
+                logger.warning("Connecting %s failed: %s", name, result)
+                self.errors[name] = failed[name] = result
+            else:
+                self.errors.pop(name, None)
+        return failed
+
+    async def disconnect(self):
+        results = await asyncio.gather(*(g.disconnect() for g in self.units.values()), return_exceptions=True)
+        for name, result in zip(self.units, results):
+            if isinstance(result, BaseException):
+                logger.warning("Disconnecting %s failed: %s", name, result)
+
+    def _targets(self, names) -> list[tuple[str, Crane2S]]:
+        if names is None:
+            return [(n, g) for n, g in self.units.items() if g.transport.is_connected]
+        return [(n, self.units[n]) for n in names]
+
+    async def _each(self, names, fn) -> dict[str, BaseException]:
+        targets = self._targets(names)
+        results = await asyncio.gather(*(fn(g) for _, g in targets), return_exceptions=True)
+        failed = {}
+        for (name, _), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                self.send_failures[name] += 1
+                self.errors[name] = failed[name] = result
+            else:
+                self.errors.pop(name, None)
+        return failed
+
+    async def broadcast(self, cmd_id: int, value: int, speed: int, names=None) -> dict[str, BaseException]:
+        """
+        Send one command to every connected unit (or to `names`) concurrently.
+
+        Returns the units the command could not be sent to.
+        """
+        return await self._each(names, lambda g: g.send_cmd(cmd_id, value, speed))
+
+    def post(self, cmd_id: int, value: int, speed: int, names=None):
+        """Set the latest target of one axis on every unit without waiting (mailbox)."""
+        for _, gimbal in self._targets(names):
+            gimbal.post_cmd(cmd_id, value, speed)
+
+    def pan(self, value: int, speed: int, duration: float = 1.0, names=None) -> dict[str, MotionHandle]:
+        """Start a continuous pan on each unit; returns the handle of every unit."""
+        return {n: g.pan(value, speed, duration) for n, g in self._targets(names)}
+
+    def tilt(self, value: int, speed: int, duration: float = 1.0, names=None) -> dict[str, MotionHandle]:
+        """Start a continuous tilt on each unit; returns the handle of every unit."""
+        return {n: g.tilt(value, speed, duration) for n, g in self._targets(names)}
+
+    async def stop(self, names=None) -> dict[str, BaseException]:
+        """Emergency stop on every unit at once."""
+        return await self._each(names, lambda g: g.stop())
+
+    async def reset_position(self, speed_pct: float = 0.1, names=None) -> dict[str, BaseException]:
+        return await self._each(names, lambda g: g.reset_position(speed_pct))
+
+    def health(self) -> dict[str, dict]:
+        """
+        Per-unit health:
+
+        - connected
+        - error: last connect or send error, if any
+        - send_failures: failed fleet commands
+        - last_notify_age: seconds since the last notification (None: never)
+        - queue_depth: commands waiting in the unit's writer
+        - heartbeats: echo counters (see `Crane2S.heartbeat_stats`)
+        """
+        now = time.monotonic_ns()
+        report = {}
+        for name, gimbal in self.units.items():
+            last = gimbal.last_notify_ns
+            error = self.errors.get(name)
+            report[name] = {
+                'connected': gimbal.transport.is_connected,
+                'error': None if error is None else repr(error),
+                'send_failures': self.send_failures[name],
+                'last_notify_age': None if last is None else (now - last) / 1e9,
+                'queue_depth': gimbal.queue_depth,
+                'heartbeats': gimbal.heartbeat_stats,
+            }
+        return report
@@ -0,0 +1,127 @@
+"""
+Columnar ring buffers for recent command and notification history.
+
+Needs NumPy, an optional dependency (`pip install numpy`).
+
+Rows live in a NumPy record array of twice the capacity and every row is
+written to both halves. Because of that mirror, the newest N rows
+(N <= capacity) are always one contiguous slice, so window queries return
+per-column array views with no copying or re-ordering. One record assignment
+per half keeps appends cheap enough for the send path.
+"""
+import time
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("TelemetryHistory needs NumPy, which is not installed (pip install numpy)") from e
+
+COMMAND_COLUMNS = {
+    't_ns': np.int64,
+    'seq': np.uint8,
+    'cmd': np.uint8,
+    'value': np.uint16,
+    'speed': np.uint8,
+}
+
+NOTIFY_COLUMNS = {
+    't_ns': np.int64,
+    'format_id': np.uint16,
+    'seq': np.int16,   # -1 when the frame is too short to carry one
+    'length': np.uint16,
+}
+
+
+class ColumnRing:
+    """
+    Fixed-capacity, column-oriented ring buffer.
+
+    Args:
+        capacity: rows kept; older rows are overwritten
+        columns: column name -> NumPy dtype, in `append` order. The first
+            column must be a non-decreasing timestamp in ns for `window`.
+    """
+    def __init__(self, capacity: int, columns: dict):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.names = tuple(columns)
+        self._rows = np.zeros(2 * capacity, dtype=list(columns.items()))
+        self._time = self.names[0]
+        self._n = 0
+
+    def __len__(self) -> int:
+        return min(self._n, self.capacity)
+
+    @property
+    def total(self) -> int:
+        """Rows appended since creation, including overwritten ones."""
+        return self._n
+
+    def append(self, *values):
+        i = self._n % self.capacity
+        rows = self._rows
+        rows[i] = values
+        rows[i + self.capacity] = values
+        self._n += 1
+
+    def _bounds(self, n: int) -> tuple[int, int]:
+        n = min(n, len(self))
+        end = (self._n - 1) % self.capacity + self.capacity + 1 if self._n else self.capacity
+        return end - n, end
+
+    def last(self, n: int = None) -> dict:
+        """Views of the newest `n` rows (all rows if None), oldest first."""
+        start, end = self._bounds(len(self) if n is None else n)
+        return self._columns(start, end)
+
+    def window(self, seconds: float, now_ns: int = None) -> dict:
+        """Views of the rows whose timestamp lies within the last `seconds`."""
+        if now_ns is None:
+            now_ns = time.monotonic_ns()
+        start, end = self._bounds(len(self))
+        t = self._rows[self._time][start:end]
+        start += int(np.searchsorted(t, now_ns - int(seconds * 1e9), side='left'))
+        return self._columns(start, end)
+
+    def _columns(self, start: int, end: int) -> dict:
+        rows = self._rows[start:end]
+        return {name: rows[name] for name in self.names}
+
+
+class TelemetryHistory:
+    """
+    Recent commands and notifications of one gimbal, fed by `Crane2S`.
+
+    - `commands`: every command packet written (t_ns, seq, cmd, value, speed)
+    - `axis(cmd_id)`: the same, for one axis only, so e.g. "last 2 s of pan
+      commands" is `history.axis(0x02).window(2.0)` and still a view
+    - `notifications`: every notification received (t_ns, format_id, seq, length)
+
+    Timestamps are `time.monotonic_ns()`.
+    """
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self.commands = ColumnRing(capacity, COMMAND_COLUMNS)
+        self.notifications = ColumnRing(capacity, NOTIFY_COLUMNS)
+        self._axes: dict[int, ColumnRing] = {}
+
+    def axis(self, cmd_id: int) -> ColumnRing:
+        ring = self._axes.get(cmd_id)
+        if ring is None:
+            ring = self._axes[cmd_id] = ColumnRing(self.capacity, COMMAND_COLUMNS)
+        return ring
+
+    def record_command(self, pkt, t_ns: int):
+        """Record a written packet; anything but a 0x1812 command is ignored."""
+        if len(pkt) < 14 or pkt[4] != 0x18 or pkt[5] != 0x12:
+            return
+        row = (t_ns, pkt[6], pkt[8], pkt[9] | ((pkt[10] & 0x0F) << 8), pkt[11])
+        self.commands.append(*row)
+        self.axis(pkt[8]).append(*row)
+
+    def record_notification(self, data, t_ns: int):
+        if len(data) < 6:
+            return
+        self.notifications.append(
+            t_ns, (data[4] << 8) | data[5], data[6] if len(data) > 6 else -1, len(data))
@@ -1,33 +1,93 @@
-import asyncio
-import struct
 import logging
-from bleak import BleakClient
-
+import time
+from typing import TYPE_CHECKING
+
+from .clock import LOOP_CLOCK, Clock
+from .Crane2SProtocol import Crane2SProtocol
+from .dispatch import NotifyDispatcher, Subscription
+from .metrics import NULL_REGISTRY, Histogram, MetricsRegistry
+from .motion import MotionDriver, MotionHandle
+from .packetlog import PacketLog
+from .scheduler import TickScheduler
+from .telemetry import TelemetryStream
+from .transport import BleakTransport, Transport
+from .writer import PacketWriter
+
+if TYPE_CHECKING:
+    from .history import TelemetryHistory
+
+# Logging configuration is left to the application
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 class Crane2S:
     """
-    Low-level Crane 2S Gimbal BLE controller.
+    Low-level Crane 2S Gimbal controller.
     Provides raw packet sending, connection management, and basic motion commands.
+
+    Talks BLE through bleak unless another `Transport` (serial, UDP, loopback) is given.
     """
     def __init__(
         self,
         address: str,
         write_uuid: str = "d44bc439-abfd-45a2-b575-925416129600",
-        notify_uuid: str = "d44bc439-abfd-45a2-b575-925416129601"
+        notify_uuid: str = "d44bc439-abfd-45a2-b575-925416129601",
+        protocol: Crane2SProtocol = None,
+        mailbox: bool = False,
+        motion_rate: float = 5.0,
+        tick_policy: str = 'skip',
+        metrics: MetricsRegistry = None,
+        packet_log: PacketLog = None,
+        history: "TelemetryHistory" = None,
+        transport: Transport = None,
+        clock: Clock = None
     ):
         self.address = address
+        # Metrics are off unless a registry is given; all series are labelled by address
+        self.metrics = metrics or NULL_REGISTRY
+        labels = {'address': address}
 
         # The gimbal has two characteristics, write-no-response and notify
         self.write_uuid = write_uuid
         self.notify_uuid = notify_uuid
 
-        # The data format for sending data to the gimbal includes a byte that increments with each packet sent
-        # _seq stores the increment number.
-        self._seq = 0
-        self._client: BleakClient = None
+        # All packets are encoded by the protocol object, which also owns the sequence counter.
+        # Pass a shared instance to keep raw-packet users and this client on one counter.
+        self.protocol = protocol if protocol is not None else Crane2SProtocol(metrics=metrics, labels=labels)
+        # Link to the gimbal; BLE by default, bleak is imported on connect
+        self.transport = transport if transport is not None else BleakTransport(address, write_uuid, notify_uuid)
+        # Raw packet logging is opt-in; without it no per-packet logging work is done
+        self.packet_log = packet_log
+        # Optional columnar record of recent commands and notifications (NumPy)
+        self.history = history
         self._heartbeat_enabled = False
+        # Link-quality histograms (ns): notification and heartbeat inter-arrival times
+        self.notify_interval = Histogram()
+        self.heartbeat_interval = Histogram()
+        self._last_notify_ns = None
+        self._last_heartbeat_ns = None
+        self.metrics.histogram('crane2s_notify_interval_seconds', "Time between notifications",
+                               labels, histogram=self.notify_interval)
+        self.metrics.histogram('crane2s_heartbeat_interval_seconds', "Time between heartbeats",
+                               labels, histogram=self.heartbeat_interval)
+        # Per-format-ID notification subscribers
+        self._dispatch = NotifyDispatcher()
+        self._telemetry: list[TelemetryStream] = []
+        # format ID -> notification counter, filled on first sight of each type
+        self._notify_counts = {}
+        self._connects = self.metrics.counter('crane2s_connects_total', "Successful connects", labels)
+        self._reconnects = self.metrics.counter('crane2s_reconnects_total', "Connects after the first", labels)
+        # Single task that performs every write, in queue order
+        self._writer = PacketWriter(
+            self._write_packet, self.protocol, metrics=metrics, labels=labels,
+            write_many=self._write_packets if self.transport.batch_writes else None)
+        # In mailbox mode pan_pct/tilt_pct only post the latest per-axis target
+        self.mailbox = mailbox
+        # Time source for every wait and timer; the event loop's clock unless given
+        self.clock = clock if clock is not None else LOOP_CLOCK
+        # Shared by all continuous motions; ticks on absolute deadlines
+        self.scheduler = TickScheduler(motion_rate, tick_policy, self.clock)
+        # One tick loop re-sends every active motion through the writer mailbox
+        self._motions = MotionDriver(self.scheduler, self._writer.post)
 
     # For `async with ...`
     async def __aenter__(self):
@@ -40,77 +100,116 @@ class Crane2S:
     async def connect(self, timeout: float = 10.0):
         logger.info(f"Connecting to {self.address}...")
 
-        # Connect to the given MAC address with bleak
-        self._client = BleakClient(self.address)
-        await self._client.connect(timeout=timeout)
+        await self.transport.connect(timeout=timeout)
 
-        if not self._client.is_connected:
+        if not self.transport.is_connected:
             raise ConnectionError(f"Failed to connect to {self.address}")
-        if self.notify_uuid:
-            await self._client.start_notify(self.notify_uuid, self._on_notify)
-            self._heartbeat_enabled = True
+        # Stop/center packets are prebuilt so the emergency lane never has to encode
+        self.protocol.warm_cache()
+        self._writer.start()
+        if self._connects.value:
+            self._reconnects.inc()
+        self._connects.inc()
+        await self.transport.start_notify(self._on_notify)
+        self._heartbeat_enabled = True
 
         logger.info(f"Connected to {self.address}")
 
     async def disconnect(self):
-        if self._client and self._client.is_connected:
-            if self.notify_uuid:
-                self._heartbeat_enabled = False
-                await self._client.stop_notify(self.notify_uuid)
-            await self._client.disconnect()
+        # Local tasks and streams are always torn down, even if the link already dropped
+        self._heartbeat_enabled = False
+        if self.transport.is_connected:
+            await self.transport.stop_notify()
+        # Flush whatever is still queued before dropping the link
+        self._motions.cancel_all()
+        await self._writer.close()
+        await self._dispatch.close()
+        for stream in self._telemetry:
+            stream.close()
+        self._telemetry.clear()
+        if self.transport.is_connected:
+            await self.transport.disconnect()
             logger.info(f"Disconnected from {self.address}")
 
     async def send_cmd(self, cmd_id: int, value: int, speed: int):
         """
         Send a single motion command (pan/tilt/roll) without repeat.
+
+        The command is queued to the writer task, which assigns its sequence
+        number, and this returns once it has been written. Waits if the queue is full.
+        Raises ValueError for a cmd_id outside 0–255 or a value outside 0–4095, and
+        `CommandDropped` if `stop()` discards the command before it is written.
+        """
+        await self._writer.send(cmd_id, value, speed)
+
+    async def send_cmds(self, cmds: list[tuple[int, int, int]]):
+        """Send several (cmd_id, value, speed) commands back to back, in order."""
+        await self._writer.send_many(cmds)
+
+    def post_cmd(self, cmd_id: int, value: int, speed: int):
+        """
+        Set the latest target for one axis without waiting (latest value wins).
+
+        A target that has not been written yet is overwritten, so producers that
+        run faster than the link never build up a backlog.
+        """
+        self._writer.post(cmd_id, value, speed)
+
+    @property
+    def mailbox_stats(self) -> dict:
+        """Counters for posted, coalesced, sent and dropped mailbox targets."""
+        return self._writer.mailbox_stats
+
+    async def _write_packet(self, pkt):
+        if self.packet_log is not None:
+            self.packet_log.record('tx', pkt)
+        if self.history is not None:
+            self.history.record_command(pkt, time.monotonic_ns())
+        await self.transport.write(pkt)
+
+    async def _write_packets(self, pkts):
+        if self.packet_log is not None or self.history is not None:
+            now = time.monotonic_ns()
+            for pkt in pkts:
+                if self.packet_log is not None:
+                    self.packet_log.record('tx', pkt)
+                if self.history is not None:
+                    self.history.record_command(pkt, now)
+        await self.transport.write_many(pkts)
+
+    def _build_cmd(self, cmd_id: int, value: int, speed: int) -> bytes:
+        return self.protocol.build_cmd(cmd_id, value, speed)
+
+    def pan(self, value: int, speed: int, duration: float = 1.0) -> MotionHandle:
         """
-        pkt = self._build_cmd(cmd_id, value, speed)
-        logger.debug(f"Sending packet: {pkt.hex()}")
-        await self._client.write_gatt_char(self.write_uuid, pkt, response=False)
-
-    def _build_cmd(self, cmd_id: int, value: int, speed: int) -> bytearray:
-        pkt = bytearray(b"\x24\x3C")
-        pkt += (8).to_bytes(2, 'little')                # length
-        pkt += bytes.fromhex('1812')                    # format ID
-        pkt += self._seq.to_bytes(1, 'little')          # sequence
-        self._seq = (self._seq + 1) & 0xFF
-        pkt += b"\x01"                                # direction
-        pkt += cmd_id.to_bytes(1, 'little')             # command
-        pkt += (value & 0x0FFF).to_bytes(2, 'little')    # value
-        pkt += max(1, min(speed, 255)).to_bytes(1, 'little')  # speed
-        crc = self._xmodem_crc16(pkt[4:])               # CRC over bytes 4–11
-        pkt += crc.to_bytes(2, 'little')
-        return pkt
-
-    # A XMODEM CRC-16 over bytes 4-13 has to be appended at the end of the packet
-    def _xmodem_crc16(self, data: bytes) -> int:
-        crc = 0x0000
-        for b in data:
-            crc ^= b << 8
-            for _ in range(8):
-                crc = (crc << 1) ^ 0x1021 if (crc & 0x8000) else (crc << 1)
-                crc &= 0xFFFF
-        return crc
-
-    async def pan(self, value: int, speed: int, duration: float = 1.0):
-        """Continuous pan: 0–2047 right, 2049–4095 left."""
-        await self._motion_loop(0x02, value, speed, duration)
-
-    async def tilt(self, value: int, speed: int, duration: float = 1.0):
-        """Continuous tilt: 0–2047 up, 2049–4095 down."""
-        await self._motion_loop(0x01, value, speed, duration)
+        Continuous pan: 0–2047 right, 2049–4095 left.
+
+        Returns immediately with a handle; `await` it to wait for the move to end.
+        `duration=None` keeps panning until the handle is cancelled.
+        """
+        return self._start_motion(0x02, value, speed, duration)
+
+    def tilt(self, value: int, speed: int, duration: float = 1.0) -> MotionHandle:
+        """Continuous tilt: 0–2047 up, 2049–4095 down. Returns a handle like `pan`."""
+        return self._start_motion(0x01, value, speed, duration)
 
     async def pan_pct(self, pct: float, speed_pct: float = 0.1):
-        """Pan by normalized percentage (-1.0…1.0)."""
+        """Pan by normalized percentage (-1.0…1.0). Returns immediately in mailbox mode."""
         val = int(2048 + pct * 2047)
         spd = int(max(1, min(255, speed_pct * 255)))
-        await self.send_cmd(0x02, val, spd)
+        if self.mailbox:
+            self.post_cmd(0x02, val, spd)
+        else:
+            await self.send_cmd(0x02, val, spd)
 
     async def tilt_pct(self, pct: float, speed_pct: float = 0.1):
-        """Tilt by normalized percentage (-1.0…1.0)."""
+        """Tilt by normalized percentage (-1.0…1.0). Returns immediately in mailbox mode."""
         val = int(2048 - pct * 2047)
         spd = int(max(1, min(255, speed_pct * 255)))
-        await self.send_cmd(0x01, val, spd)
+        if self.mailbox:
+            self.post_cmd(0x01, val, spd)
+        else:
+            await self.send_cmd(0x01, val, spd)
 
     async def pan_step(self, direction: str, step: int = 1, speed: int = 10):
         """Step pan by 'step' units: 'left' or 'right'."""
@@ -136,40 +235,143 @@ class Crane2S:
         await self.send_cmd(0x01, val, speed)
 
     async def stop(self):
-        """Stop all motion immediately."""
-        await asyncio.gather(
-            self.send_cmd(0x02, 2048, 1),
-            self.send_cmd(0x01, 2048, 1)
-        )
+        """
+        Stop all motion immediately.
+
+        Cancels running motions, drops queued commands and mailbox targets, and
+        writes the pan/tilt center packets ahead of anything else. Only a write
+        already in flight is allowed to finish first.
+        """
+        self._motions.cancel_all()
+        await self._writer.send_urgent([(0x02, 2048, 1), (0x01, 2048, 1)], cached=True)
+
+    @property
+    def heartbeat_stats(self) -> dict:
+        """Counters for heartbeat echoes sent, failed, delayed behind a write, and dropped."""
+        return self._writer.heartbeat_stats
+
+    @property
+    def queue_depth(self) -> int:
+        """Commands waiting in the writer queue."""
+        return self._writer.depth
+
+    @property
+    def last_notify_ns(self) -> int:
+        """`time.monotonic_ns()` of the most recent notification, or None if none arrived yet."""
+        return self._last_notify_ns
+
+    def _count_notify(self, data):
+        fid = (data[4] << 8) | data[5] if len(data) >= 6 else -1
+        counter = self._notify_counts.get(fid)
+        if counter is None:
+            fmt = f"0x{fid:04x}" if fid >= 0 else "short"
+            counter = self._notify_counts[fid] = self.metrics.counter(
+                'crane2s_notifications_total', "Notifications received, by format ID",
+                {'address': self.address, 'format': fmt})
+        counter.inc()
+
+    def link_metrics(self) -> dict:
+        """
+        Link-quality snapshot, all times in seconds.
+
+        - heartbeat_echo_latency: heartbeat received -> echo write completed
+        - heartbeat_interval / notify_interval: inter-arrival times
+        - heartbeats: echo counters (see `heartbeat_stats`)
+
+        Each histogram reports count, min, mean, p50, p90, p99 and max.
+        """
+        return {
+            'heartbeat_echo_latency': self._writer.heartbeat_latency.snapshot(),
+            'heartbeat_interval': self.heartbeat_interval.snapshot(),
+            'notify_interval': self.notify_interval.snapshot(),
+            'heartbeats': self._writer.heartbeat_stats,
+        }
+
+    @property
+    def stop_latency(self) -> dict:
+        """Count, last and max latency (s) from calling `stop` to its first packet being written."""
+        return self._writer.urgent_stats
 
     async def reset_position(self, speed_pct: float = 0.1):
         """Center gimbal: stop and hold central position."""
-        await asyncio.gather(
-            self.pan_pct(0.0, speed_pct),
-            self.tilt_pct(0.0, speed_pct)
-        )
+        spd = int(max(1, min(255, speed_pct * 255)))
+        await self._writer.send_many([(0x02, 2048, spd), (0x01, 2048, spd)], cached=True)
 
-    async def _motion_loop(self, cmd_id: int, value: int, speed: int, duration: float):
-        if not self._client or not self._client.is_connected:
+    def _start_motion(self, cmd_id: int, value: int, speed: int, duration: float) -> MotionHandle:
+        if not self.transport.is_connected:
             raise ConnectionError("Not connected")
+        # A new motion on an axis preempts the one already running there
+        return self._motions.start(cmd_id, value, speed, duration)
 
-        count = max(1, int(duration / 0.2))
+    async def _motion_loop(self, cmd_id: int, value: int, speed: int, duration: float):
+        await self._start_motion(cmd_id, value, speed, duration)
+
+    @property
+    def motions(self) -> list[MotionHandle]:
+        """Continuous motions that are currently running."""
+        return self._motions.active
 
-        for _ in range(count):
-            await self.send_cmd(cmd_id, value, speed)
-            await asyncio.sleep(0.2)
+    @property
+    def tick_stats(self) -> dict:
+        """Per-tick jitter and missed-tick counts of the motion scheduler."""
+        return self.scheduler.stats
 
     def _on_notify(self, sender, data: bytearray):
         """Handles the notification packets received from the gimbal. Echo if enabled."""
-
+        now = time.monotonic_ns()
+        if self.packet_log is not None:
+            self.packet_log.record('rx', data)
+        if self.history is not None:
+            self.history.record_notification(data, now)
+        if self._last_notify_ns is not None:
+            self.notify_interval.record(now - self._last_notify_ns)
+        self._last_notify_ns = now
+        if self.metrics.enabled:
+            self._count_notify(data)
+
+        if len(data) < 6:
+            return
         # `0x1815` -> Packet was sent from gimbal to app
-        if len(data) >= 6 and data[4] == 0x18 and data[5] == 0x15:
+        if data[4] == 0x18 and data[5] == 0x15:
+            if self._last_heartbeat_ns is not None:
+                self.heartbeat_interval.record(now - self._last_heartbeat_ns)
+            self._last_heartbeat_ns = now
             if self._heartbeat_enabled:
-                asyncio.create_task(self._client.write_gatt_char(
-                    self.write_uuid, data, response=False))
-        else:
-            cid = getattr(sender, 'uuid', str(sender))
-            logger.info(f"[Notify] {cid}: {data.hex()}")
+                self._writer.echo_heartbeat(data, now)
+        # Subscribers only run after the heartbeat echo has been queued
+        if self._dispatch._subs:
+            self._dispatch.dispatch((data[4] << 8) | data[5], data)
+
+    def on(self, format_id, callback, offload: bool = False) -> Subscription:
+        """
+        Subscribe to notifications whose format ID (bytes 4–5, e.g. 0x1815) is `format_id`.
+
+        `callback(data)` runs inside the BLE callback unless `offload=True` (or
+        it is a coroutine function), in which case it runs from a worker task
+        fed by a bounded queue. `format_id=None` receives every notification.
+        Call `.cancel()` on the returned subscription to unsubscribe.
+        """
+        return self._dispatch.on(format_id, callback, offload)
+
+    def telemetry(self, maxsize: int = 256, policy: str = 'drop_oldest', format_ids=None) -> TelemetryStream:
+        """
+        Stream decoded notifications: `async for sample in gimbal.telemetry(): ...`
+
+        Each sample carries the arrival `monotonic_ns`, the format ID and the
+        decoded message. The queue holds at most `maxsize` samples; `policy`
+        ('drop_oldest', 'drop_newest' or 'block') decides what happens when it
+        is full, and `stream.stats` reports drops. The stream ends on disconnect.
+        """
+        # Samples are stamped with the time _on_notify saw the notification arrive
+        stream = TelemetryStream(maxsize, policy, format_ids, arrival_ns=lambda: self._last_notify_ns)
+        stream._subscription = self.on(None, stream._push)
+        self._telemetry = [s for s in self._telemetry if not s.closed]
+        self._telemetry.append(stream)
+        return stream
+
+    def subscriber_stats(self) -> list[dict]:
+        """Calls, errors, drops and callback timing for every subscriber."""
+        return [sub.stats for sub in self._dispatch.subscriptions]
 
 class Crane2SPresets:
     """
@@ -197,9 +399,9 @@ class Crane2SPresets:
         """Pan left→right repeatedly."""
         for _ in range(cycles):
             await self.gimbal.pan_pct(left_pct, speed_pct)
-            await asyncio.sleep(dwell)
+            await self.gimbal.clock.sleep(dwell)
             await self.gimbal.pan_pct(right_pct, speed_pct)
-            await asyncio.sleep(dwell)
+            await self.gimbal.clock.sleep(dwell)
 
     async def tilt_sweep(
         self,
@@ -212,9 +414,9 @@ class Crane2SPresets:
         """Tilt down→up repeatedly."""
         for _ in range(cycles):
             await self.gimbal.tilt_pct(down_pct, speed_pct)
-            await asyncio.sleep(dwell)
+            await self.gimbal.clock.sleep(dwell)
             await self.gimbal.tilt_pct(up_pct, speed_pct)
-            await asyncio.sleep(dwell)
+            await self.gimbal.clock.sleep(dwell)
 
     async def follow_path(
         self,
@@ -226,7 +428,7 @@ class Crane2SPresets:
         for pan, tilt in path:
             await self.gimbal.pan_pct(pan, speed_pct)
             await self.gimbal.tilt_pct(tilt, speed_pct)
-            await asyncio.sleep(dwell)
+            await self.gimbal.clock.sleep(dwell)
 
     async def track_2d(
         self,
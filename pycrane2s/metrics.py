@@ -0,0 +1,282 @@
+"""
+Low-overhead metrics: counters, gauges and constant-memory latency histograms,
+collected in a `MetricsRegistry` that can be snapshotted or rendered in the
+Prometheus text format. `NULL_REGISTRY` turns everything into no-ops.
+
+`Histogram` uses HDR-style log-linear buckets: values below 32 get one bucket
+each, above that every power of two is split into 16 buckets. Any recorded
+value is therefore reported within ~6% of its true value, and the bucket array
+never grows no matter how many samples are recorded.
+"""
+import math
+
+_SUB_BITS = 5
+_HALF = 1 << (_SUB_BITS - 1)
+
+
+def _bucket_index(v: int) -> int:
+    if v < (1 << _SUB_BITS):
+        return v
+    shift = v.bit_length() - _SUB_BITS
+    return shift * _HALF + (v >> shift)
+
+
+def _bucket_upper(idx: int) -> int:
+    """Largest value that falls in bucket `idx`."""
+    if idx < (1 << _SUB_BITS):
+        return idx
+    shift = idx // _HALF - 1
+    mantissa = idx % _HALF + _HALF
+    return ((mantissa + 1) << shift) - 1
+
+
+class Histogram:
+    """
+    Log-linear histogram of non-negative integers (typically nanoseconds).
+
+    Args:
+        max_bits: values up to 2**max_bits are bucketed exactly; larger values
+            are clamped into the last bucket (max() is still exact).
+    """
+    __slots__ = ('_counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, max_bits: int = 40):
+        self._counts = [0] * (_bucket_index((1 << max_bits) - 1) + 1)
+        self.reset()
+
+    def reset(self):
+        counts = self._counts
+        for i in range(len(counts)):
+            counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        idx = _bucket_index(value)
+        counts = self._counts
+        counts[idx if idx < len(counts) else -1] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> int:
+        """Value at percentile `p` (0–100), as the upper edge of its bucket."""
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for idx, n in enumerate(self._counts):
+            seen += n
+            if seen >= target:
+                return min(_bucket_upper(idx), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self, scale: float = 1e-9) -> dict:
+        """count/min/mean/p50/p90/p99/max, multiplied by `scale` (default: ns to s)."""
+        return {
+            'count': self.count,
+            'min': self.min * scale,
+            'mean': self.mean * scale,
+            'p50': self.percentile(50) * scale,
+            'p90': self.percentile(90) * scale,
+            'p99': self.percentile(99) * scale,
+            'max': self.max * scale,
+        }
+
+
+class Counter:
+    """Monotonically increasing count."""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+
+class Gauge:
+    """Value that can go up and down."""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, n=1):
+        self.value += n
+
+    def dec(self, n=1):
+        self.value -= n
+
+
+class _FuncMetric:
+    # Counter/gauge read from a callback at snapshot time; costs nothing on the hot path
+    __slots__ = ('fn',)
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    @property
+    def value(self):
+        return self.fn()
+
+
+class _NullMetric:
+    __slots__ = ()
+    value = 0
+    count = 0
+
+    def inc(self, n=1):
+        pass
+
+    def dec(self, n=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def record(self, value):
+        pass
+
+
+_NULL = _NullMetric()
+
+
+def _label_str(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms with a snapshot API and a Prometheus
+    text-format renderer.
+
+    Metrics are keyed by name plus labels; asking for the same name/labels twice
+    returns the same object, so several gimbals can share one registry and be
+    told apart by label.
+    """
+    enabled = True
+
+    def __init__(self):
+        # name -> (kind, help, {labels tuple: (metric, scale)})
+        self._families: dict[str, tuple[str, str, dict]] = {}
+
+    def _get(self, kind: str, name: str, help: str, labels, factory, scale: float = 1.0):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help, {})
+        elif family[0] != kind:
+            raise ValueError(f"metric {name!r} already registered as a {family[0]}")
+        key = tuple(sorted(labels.items())) if labels else ()
+        entry = family[2].get(key)
+        if entry is None:
+            entry = family[2][key] = (factory(), scale)
+        return entry[0]
+
+    def counter(self, name: str, help: str = '', labels: dict = None, fn=None) -> Counter:
+        """Get or create a counter. With `fn`, the value is read from `fn()` on snapshot."""
+        return self._get('counter', name, help, labels, (lambda: _FuncMetric(fn)) if fn else Counter)
+
+    def gauge(self, name: str, help: str = '', labels: dict = None, fn=None) -> Gauge:
+        """Get or create a gauge. With `fn`, the value is read from `fn()` on snapshot."""
+        return self._get('gauge', name, help, labels, (lambda: _FuncMetric(fn)) if fn else Gauge)
+
+    def histogram(self, name: str, help: str = '', labels: dict = None,
+                  histogram: Histogram = None, scale: float = 1e-9) -> Histogram:
+        """
+        Get or create a histogram, or register an existing one.
+
+        Values are reported multiplied by `scale` (default: recorded ns shown as seconds).
+        """
+        return self._get('histogram', name, help, labels, lambda: histogram or Histogram(), scale)
+
+    def snapshot(self) -> dict:
+        """{name: {label string: value}}; histograms map to their `snapshot()` dict."""
+        out = {}
+        for name, (kind, _, children) in self._families.items():
+            values = out[name] = {}
+            for labels, (metric, scale) in children.items():
+                key = _label_str(labels)
+                values[key] = metric.snapshot(scale) if kind == 'histogram' else metric.value
+        return out
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for name, (kind, help, children) in self._families.items():
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {'summary' if kind == 'histogram' else kind}")
+            for labels, (metric, scale) in children.items():
+                if kind != 'histogram':
+                    lines.append(f"{name}{_label_str(labels)} {metric.value}")
+                    continue
+                for q in (0.5, 0.9, 0.99):
+                    lq = _label_str(labels + (('quantile', q),))
+                    lines.append(f"{name}{lq} {metric.percentile(q * 100) * scale}")
+                lines.append(f"{name}_sum{_label_str(labels)} {metric.total * scale}")
+                lines.append(f"{name}_count{_label_str(labels)} {metric.count}")
+        lines.append('')
+        return '\n'.join(lines)
+
+
+class NullRegistry(MetricsRegistry):
+    """Registry used when metrics are disabled: every metric is a shared no-op."""
+    enabled = False
+
+    def _get(self, kind, name, help, labels, factory, scale=1.0):
+        return _NULL
+
+    def histogram(self, name, help='', labels=None, histogram=None, scale=1e-9):
+        # Histograms that exist anyway are handed back so their owner keeps recording
+        return histogram if histogram is not None else _NULL
+
+
+NULL_REGISTRY = NullRegistry()
+
+
+async def serve_metrics(registry: MetricsRegistry, host: str = '127.0.0.1', port: int = 9464):
+    """
+    Serve `registry` in Prometheus text format at GET /metrics.
+
+    Returns the started `asyncio.Server`; close it to stop serving.
+    """
+    # Imported here so protocol-only users of this module never load asyncio
+    import asyncio
+
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            # Drain the headers; the request has no body
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b'GET' and parts[1].split(b'?')[0] in (b'/', b'/metrics'):
+                status, body = b'200 OK', registry.render_prometheus().encode()
+            else:
+                status, body = b'404 Not Found', b'not found\n'
+            writer.write(b'HTTP/1.1 ' + status + b'\r\n'
+                         b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\n'
+                         b'Connection: close\r\n\r\n' + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
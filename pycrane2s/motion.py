@@ -0,0 +1,138 @@
+"""
+Non-blocking continuous motions for Crane2S.
+
+A continuous motion keeps re-sending one axis command at the scheduler rate
+until its duration runs out. Each motion is represented by a `MotionHandle`;
+all active handles are serviced by a single `MotionDriver` tick loop, so pan and
+tilt can run at the same time without one task per motion.
+"""
+import asyncio
+
+from .scheduler import TickScheduler
+
+
+class MotionHandle:
+    """
+    Handle for one running continuous motion.
+
+    Awaiting the handle waits for the motion to end and returns True if it ran
+    its full duration, False if it was cancelled or preempted by a newer motion
+    on the same axis.
+    """
+    def __init__(self, driver: "MotionDriver", cmd_id: int, value: int, speed: int):
+        self._driver = driver
+        self.cmd_id = cmd_id
+        self.value = value
+        self.speed = speed
+        self.started = driver.scheduler.clock.time()
+        self._future = asyncio.get_running_loop().create_future()
+        # Timer that completes the motion; a loop timer rather than a task
+        self._timer: asyncio.TimerHandle = None
+
+    def __await__(self):
+        return self._future.__await__()
+
+    def __repr__(self):
+        state = 'done' if self.done() else 'running'
+        return f"<MotionHandle cmd=0x{self.cmd_id:02x} value={self.value} speed={self.speed} {state}>"
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def cancelled(self) -> bool:
+        """True if the motion ended before its duration ran out."""
+        return self._future.done() and not self._future.result()
+
+    def cancel(self):
+        """Stop re-sending this motion. No-op if it already ended."""
+        self._driver._finish(self, False)
+
+    def update(self, value: int = None, speed: int = None, duration: float = None):
+        """
+        Retarget the running motion; the new command is sent right away.
+
+        `duration`, if given, restarts the remaining time from now.
+        """
+        if self.done():
+            raise RuntimeError("Motion already finished")
+        value = self.value if value is None else value
+        speed = self.speed if speed is None else speed
+        # Posted before the handle takes the new target, so a bad value leaves it untouched
+        self._driver._post(self.cmd_id, value, speed)
+        self.value, self.speed = value, speed
+        if duration is not None:
+            self._driver._set_timer(self, duration)
+
+    def add_done_callback(self, fn):
+        """Call `fn(handle)` once the motion ends."""
+        self._future.add_done_callback(lambda _: fn(self))
+
+
+class MotionDriver:
+    """
+    Runs every active continuous motion from one shared tick loop.
+
+    Args:
+        scheduler: tick source; its rate is the re-send rate of every motion
+        post: non-blocking `post(cmd_id, value, speed)` used to emit commands
+    """
+    def __init__(self, scheduler: TickScheduler, post):
+        self.scheduler = scheduler
+        self._post = post
+        # cmd_id -> running handle; one motion per axis
+        self._active: dict[int, MotionHandle] = {}
+        self._task: asyncio.Task = None
+
+    @property
+    def active(self) -> list[MotionHandle]:
+        return list(self._active.values())
+
+    def start(self, cmd_id: int, value: int, speed: int, duration: float = None) -> MotionHandle:
+        """Start a motion, preempting any motion already running on the same axis."""
+        handle = MotionHandle(self, cmd_id, value, speed)
+        # Sent first: an invalid command raises here, before anything is preempted
+        self._send(handle)
+        old = self._active.get(cmd_id)
+        if old is not None:
+            self._finish(old, False)
+        self._active[cmd_id] = handle
+        if duration is not None:
+            self._set_timer(handle, duration)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return handle
+
+    def cancel_all(self):
+        for handle in list(self._active.values()):
+            self._finish(handle, False)
+
+    def _send(self, handle: MotionHandle):
+        # Not cached: motion targets are mostly one-off values, and a cache entry
+        # costs 256 encodes up front
+        self._post(handle.cmd_id, handle.value, handle.speed)
+
+    def _set_timer(self, handle: MotionHandle, duration: float):
+        if handle._timer is not None:
+            handle._timer.cancel()
+        handle._timer = self.scheduler.clock.call_later(duration, self._finish, handle, True)
+
+    def _finish(self, handle: MotionHandle, completed: bool):
+        if handle._timer is not None:
+            handle._timer.cancel()
+            handle._timer = None
+        if self._active.get(handle.cmd_id) is handle:
+            del self._active[handle.cmd_id]
+        if not handle._future.done():
+            handle._future.set_result(completed)
+
+    async def _run(self):
+        # Tick 0 fires immediately; start() already sent it, so skip it here
+        first = True
+        async for _ in self.scheduler.ticks_for(None):
+            if not self._active:
+                return
+            if first:
+                first = False
+                continue
+            for handle in self._active.values():
+                self._send(handle)
@@ -0,0 +1,87 @@
+"""
+Opt-in raw packet logging for Crane2S.
+
+Nothing here runs unless a `PacketLog` is passed to `Crane2S`. Even then hex
+formatting only happens for records the logger actually emits, and sampling or
+a per-second cap keeps busy links from flooding the logs. An optional ring
+buffer keeps the most recent raw packets for post-mortem dumps.
+"""
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class _Hex:
+    # Defers bytes.hex() until the log record is actually formatted
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return self.data.hex()
+
+
+class PacketLog:
+    """
+    Logs sent ('tx') and received ('rx') packets.
+
+    Args:
+        logger: where records go (default: this module's logger)
+        level: log level of packet records
+        sample_every: only log every Nth packet
+        max_per_second: cap on logged packets per second; extra ones are
+            counted in `suppressed`
+        ring_size: keep the last N packets (any direction, logged or not) for `dump()`
+    """
+    def __init__(
+        self,
+        logger: logging.Logger = logger,
+        level: int = logging.DEBUG,
+        sample_every: int = 1,
+        max_per_second: float = None,
+        ring_size: int = 0
+    ):
+        self.logger = logger
+        self.level = level
+        self.sample_every = max(1, sample_every)
+        self.max_per_second = max_per_second
+        self._ring = deque(maxlen=ring_size) if ring_size else None
+        self._n = 0
+        self._window_start = 0
+        self._window_count = 0
+        self.suppressed = 0
+
+    def record(self, direction: str, pkt):
+        if self._ring is not None:
+            self._ring.append((time.monotonic_ns(), direction, bytes(pkt)))
+        if not self.logger.isEnabledFor(self.level):
+            return
+        self._n += 1
+        if self._n % self.sample_every:
+            return
+        if self.max_per_second is not None:
+            now = time.monotonic_ns()
+            if now - self._window_start >= 1_000_000_000:
+                self._window_start = now
+                self._window_count = 0
+            if self._window_count >= self.max_per_second:
+                self.suppressed += 1
+                return
+            self._window_count += 1
+        # Copied: the writer reuses one buffer, and handlers may format the record later
+        self.logger.log(self.level, "%s %s", direction, _Hex(bytes(pkt)))
+
+    def dump(self) -> list[tuple[int, str, bytes]]:
+        """Recent packets as (monotonic_ns, direction, raw bytes), oldest first."""
+        return list(self._ring) if self._ring is not None else []
+
+    def format_dump(self) -> str:
+        """The ring buffer as text, one packet per line, times relative to the newest."""
+        packets = self.dump()
+        if not packets:
+            return ''
+        last = packets[-1][0]
+        return '\n'.join(f"{(t - last) / 1e6:+10.3f} ms {d} {p.hex()}" for t, d, p in packets)
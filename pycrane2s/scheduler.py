@@ -0,0 +1,100 @@
+"""
+Fixed-rate tick scheduler for continuous motions.
+
+Ticks fire on absolute monotonic deadlines (start + k * period), so the time it
+takes to send a command does not push later ticks back and no drift builds up
+over long moves. Time comes from the scheduler's `Clock`, so the same code runs
+on real or virtual time.
+"""
+import math
+
+from .clock import LOOP_CLOCK, Clock
+
+POLICIES = ('skip', 'catch_up')
+
+
+class TickScheduler:
+    """
+    Generates ticks at `rate_hz` on absolute deadlines.
+
+    Args:
+        rate_hz: ticks per second
+        policy: what to do when one or more deadlines were missed entirely.
+            'skip' drops the missed ticks and waits for the next future deadline;
+            'catch_up' runs the missed ticks back to back.
+        clock: time source and sleep (default: the event loop's clock)
+
+    Lateness (wake-up time minus deadline) of every tick is recorded in the
+    jitter statistics, which are shared by everything using this scheduler.
+    """
+    def __init__(self, rate_hz: float = 5.0, policy: str = 'skip', clock: Clock = None):
+        if rate_hz <= 0:
+            raise ValueError("rate_hz must be positive")
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.rate_hz = rate_hz
+        self.policy = policy
+        self.clock = clock if clock is not None else LOOP_CLOCK
+        self.reset_stats()
+
+    @property
+    def period(self) -> float:
+        return 1.0 / self.rate_hz
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.missed = 0
+        self._jitter_sum = 0.0
+        self._jitter_max = 0.0
+
+    @property
+    def stats(self) -> dict:
+        """Tick count, missed ticks and mean/max lateness in seconds."""
+        return {
+            'ticks': self.ticks,
+            'missed': self.missed,
+            'jitter_mean': self._jitter_sum / self.ticks if self.ticks else 0.0,
+            'jitter_max': self._jitter_max,
+        }
+
+    def tick_count(self, duration: float) -> int:
+        """Number of ticks that fall inside `duration` seconds (at least one)."""
+        # Small epsilon so e.g. 1.0 s at 5 Hz is 5 ticks, not 6 from float error
+        return max(1, math.ceil(duration * self.rate_hz - 1e-9))
+
+    async def ticks_for(self, duration: float = None):
+        """
+        Async generator yielding tick indices for `duration` seconds.
+
+        Finishes at start + duration, so a move lasts exactly as long as asked.
+        With `duration=None` it ticks until the consumer stops iterating.
+        """
+        period = self.period
+        count = math.inf if duration is None else self.tick_count(duration)
+        clock = self.clock
+        start = clock.time()
+        k = 0
+        while k < count:
+            deadline = start + k * period
+            now = clock.time()
+            if now < deadline:
+                await clock.sleep(deadline - now)
+                now = clock.time()
+
+            late = now - deadline
+            if late >= period and self.policy == 'skip':
+                skipped = min(int(late // period), count - 1 - k)
+                self.missed += skipped
+                k += skipped
+                late -= skipped * period
+
+            self.ticks += 1
+            self._jitter_sum += late
+            if late > self._jitter_max:
+                self._jitter_max = late
+            yield k
+            k += 1
+
+        remaining = start + duration - clock.time()
+        if remaining > 0:
+            await clock.sleep(remaining)
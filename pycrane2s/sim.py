@@ -0,0 +1,338 @@
+"""
+Simulated Crane 2S gimbal for offline benchmarks and tests.
+
+`SimulatedGimbal` sits behind an in-memory transport, so `Crane2S` drives it
+exactly as it would drive the real device:
+
+    sim = SimulatedGimbal()
+    gimbal = Crane2S("sim", transport=sim.transport)
+
+Written packets are decoded and CRC-checked, and motion commands steer a
+first-order model of each axis. The simulator sends 0x1815 heartbeats and
+tracks whether they are echoed back. Link latency, jitter and loss can be
+injected in both directions.
+
+Time is the simulator's own clock, `now` (seconds). In real-time mode it
+follows the running event loop's `loop.time()` and is driven by loop timers.
+With `realtime=False` it only moves when `advance()` is called, which makes
+runs deterministic and as fast as the CPU allows.
+"""
+import asyncio
+import heapq
+import math
+import random
+
+from .crc import crc16_xmodem
+from .decoder import FORMAT_HEARTBEAT, CommandMessage, FrameDecoder, HeartbeatMessage
+from .metrics import Histogram
+from .transport import LoopbackTransport
+
+AXES = {0x01: 'tilt', 0x02: 'pan', 0x03: 'roll'}
+
+
+def heartbeat_frame(seq: int, payload: bytes = b"\x00") -> bytes:
+    """A 0x1815 heartbeat frame as the gimbal sends it."""
+    body = bytes((FORMAT_HEARTBEAT >> 8, FORMAT_HEARTBEAT & 0xFF, seq & 0xFF)) + payload
+    return b"\x24\x3C" + len(body).to_bytes(2, 'little') + body + crc16_xmodem(body).to_bytes(2, 'little')
+
+
+class Axis:
+    """
+    One axis: the commanded rate is approached with time constant `inertia`.
+
+    Args:
+        max_rate: deg/s at full deflection and speed 255
+        inertia: time constant (s) of the rate response; 0 for instant
+        limits: (min, max) angle in degrees, or None for unlimited
+    """
+    def __init__(self, max_rate: float, inertia: float, limits: tuple = None):
+        self.max_rate = max_rate
+        self.inertia = inertia
+        self.limits = limits
+        self.angle = 0.0
+        self.rate = 0.0
+        self.target = 0.0
+        # Sim time the current target expires (the gimbal stops without fresh commands)
+        self.expires = math.inf
+
+    def command(self, value: int, speed: int, now: float, timeout: float):
+        # 0–2047 one way, 2049–4095 the other, 2048 stop
+        deflection = max(-1.0, min(1.0, (2048 - value) / 2047))
+        self.target = deflection * self.max_rate * speed / 255
+        self.expires = now + timeout if self.target else math.inf
+
+    def step(self, t0: float, t1: float):
+        """Integrate from sim time t0 to t1."""
+        if self.expires <= t1:
+            # Also when a step ends exactly on the timeout, or the previous one did
+            self._integrate(self.expires - t0)
+            t0 = self.expires
+            self.target = 0.0
+            self.expires = math.inf
+        self._integrate(t1 - t0)
+
+    def _integrate(self, dt: float):
+        if dt <= 0 or (not self.rate and not self.target):
+            return
+        if self.inertia > 0:
+            # Exact solution of rate' = (target - rate) / inertia
+            decay = math.exp(-dt / self.inertia)
+            delta = self.rate - self.target
+            self.angle += self.target * dt + delta * self.inertia * (1 - decay)
+            self.rate = self.target + delta * decay
+            if abs(self.rate - self.target) < 1e-9:
+                self.rate = self.target
+        else:
+            self.rate = self.target
+            self.angle += self.rate * dt
+        if self.limits is not None:
+            low, high = self.limits
+            if not low <= self.angle <= high:
+                self.angle = min(high, max(low, self.angle))
+                self.rate = 0.0
+
+
+class _SimTransport(LoopbackTransport):
+    # Loopback whose connect/disconnect start and stop the simulator
+    def __init__(self, sim: "SimulatedGimbal"):
+        super().__init__(on_write=sim.receive, keep=0)
+        self.sim = sim
+
+    async def connect(self, timeout: float = 10.0):
+        await super().connect(timeout)
+        self.sim.start()
+
+    async def disconnect(self):
+        self.sim.stop()
+        await super().disconnect()
+
+
+class SimulatedGimbal:
+    """
+    Args:
+        pan_rate, tilt_rate, roll_rate: max axis rates, deg/s
+        inertia: rate time constant (s) of all axes
+        tilt_limits: tilt range in degrees
+        command_timeout: an axis stops this long after its last command
+        heartbeat_interval: seconds between heartbeats (None: no heartbeats)
+        heartbeat_timeout: a heartbeat not echoed within this is counted missed
+        latency: one-way link delay, s
+        jitter: uniform +/- variation of the delay, s (order is preserved, as on BLE)
+        loss: probability that a packet is lost, each direction
+        seed: seed for the jitter/loss random generator
+        realtime: follow the event loop clock; False to step with `advance()`
+    """
+    def __init__(
+        self,
+        pan_rate: float = 90.0,
+        tilt_rate: float = 60.0,
+        roll_rate: float = 60.0,
+        inertia: float = 0.1,
+        tilt_limits: tuple = (-90.0, 90.0),
+        command_timeout: float = 0.5,
+        heartbeat_interval: float = 0.1,
+        heartbeat_timeout: float = 1.0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        loss: float = 0.0,
+        seed: int = None,
+        realtime: bool = True
+    ):
+        self.axes = {
+            0x01: Axis(tilt_rate, inertia, tilt_limits),
+            0x02: Axis(pan_rate, inertia),
+            0x03: Axis(roll_rate, inertia),
+        }
+        self.command_timeout = command_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.realtime = realtime
+        self._random = random.Random(seed)
+        self.transport = _SimTransport(self)
+
+        self.now = 0.0
+        self.running = False
+        # (sim time, order, handler, data); handlers run when sim time reaches them
+        self._events = []
+        self._order = 0
+        # Latest scheduled arrival per direction, so jitter never reorders packets
+        self._uplink_t = 0.0
+        self._downlink_t = 0.0
+        self._next_heartbeat = math.inf
+        self._decoder = FrameDecoder()
+        self._loop: asyncio.AbstractEventLoop = None
+        self._epoch = 0.0
+        self._timer: asyncio.TimerHandle = None
+
+        self.commands = 0
+        self.lost = 0
+        self.heartbeats_sent = 0
+        self.heartbeats_echoed = 0
+        self.heartbeats_missed = 0
+        self._hb_seq = 0
+        # heartbeat seq -> sim time it was sent
+        self._hb_pending: dict[int, float] = {}
+        # Heartbeat send to echo arrival at the simulator, ns
+        self.echo_latency = Histogram()
+        # Optional hook called as on_command(msg, sim_time) for every applied motion command
+        self.on_command = None
+
+    @property
+    def pan(self) -> float:
+        return self.axes[0x02].angle
+
+    @property
+    def tilt(self) -> float:
+        return self.axes[0x01].angle
+
+    @property
+    def roll(self) -> float:
+        return self.axes[0x03].angle
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'commands': self.commands,
+            'lost': self.lost,
+            'decoder': self._decoder.stats,
+            'heartbeats_sent': self.heartbeats_sent,
+            'heartbeats_echoed': self.heartbeats_echoed,
+            'heartbeats_missed': self.heartbeats_missed,
+            'echo_latency': self.echo_latency.snapshot(),
+        }
+
+    # Lifecycle
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        if self.realtime:
+            self._loop = asyncio.get_running_loop()
+            self._epoch = self._loop.time() - self.now
+        if self.heartbeat_interval:
+            self._next_heartbeat = self.now + self.heartbeat_interval
+        self._reschedule()
+
+    def stop(self):
+        self._sync()
+        self.running = False
+        self._next_heartbeat = math.inf
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    # Time
+
+    def advance(self, seconds: float):
+        """Run the simulation `seconds` forward (virtual-time mode)."""
+        self.advance_to(self.now + seconds)
+
+    def advance_to(self, t: float):
+        events = self._events
+        while True:
+            t_next = events[0][0] if events else math.inf
+            heartbeat = self._next_heartbeat < t_next
+            if heartbeat:
+                t_next = self._next_heartbeat
+            if t_next > t:
+                break
+            self._step(t_next)
+            if heartbeat:
+                self._send_heartbeat()
+                self._next_heartbeat += self.heartbeat_interval
+            else:
+                _, _, handler, data = heapq.heappop(events)
+                handler(data)
+        self._step(t)
+
+    def _step(self, t: float):
+        if t > self.now:
+            for axis in self.axes.values():
+                axis.step(self.now, t)
+            self.now = t
+
+    def _sync(self):
+        if self.realtime and self.running:
+            self.advance_to(self._loop.time() - self._epoch)
+
+    def _reschedule(self):
+        # Real-time mode: one loop timer for the next event or heartbeat
+        if not (self.realtime and self.running):
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        t_next = min(self._events[0][0] if self._events else math.inf, self._next_heartbeat)
+        if t_next < math.inf:
+            self._timer = self._loop.call_at(self._epoch + t_next, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._sync()
+        self._reschedule()
+
+    def _schedule(self, t: float, handler, data):
+        self._order += 1
+        heapq.heappush(self._events, (t, self._order, handler, data))
+
+    def _link_delay(self, last: float) -> float:
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(-self.jitter, self.jitter)
+        return max(self.now + max(0.0, delay), last)
+
+    def _lost(self) -> bool:
+        if self.loss and self._random.random() < self.loss:
+            self.lost += 1
+            return True
+        return False
+
+    # Uplink: app -> gimbal
+
+    def receive(self, pkt: bytes):
+        """Called with every packet the app writes."""
+        self._sync()
+        if self._lost():
+            return
+        self._uplink_t = self._link_delay(self._uplink_t)
+        self._schedule(self._uplink_t, self._handle_packet, pkt)
+        self._reschedule()
+
+    def _handle_packet(self, pkt: bytes):
+        for msg in self._decoder.feed(pkt):
+            if isinstance(msg, CommandMessage):
+                axis = self.axes.get(msg.cmd_id)
+                if axis is None:
+                    continue
+                self.commands += 1
+                axis.command(msg.value, msg.speed, self.now, self.command_timeout)
+                if self.on_command is not None:
+                    self.on_command(msg, self.now)
+            elif isinstance(msg, HeartbeatMessage):
+                sent = self._hb_pending.pop(msg.seq, None)
+                if sent is not None:
+                    self.heartbeats_echoed += 1
+                    self.echo_latency.record(int((self.now - sent) * 1e9))
+
+    # Downlink: gimbal -> app
+
+    def _send_heartbeat(self):
+        # Anything still unanswered after the timeout is missed
+        cutoff = self.now - self.heartbeat_timeout
+        for seq in [s for s, t in self._hb_pending.items() if t < cutoff]:
+            del self._hb_pending[seq]
+            self.heartbeats_missed += 1
+        seq = self._hb_seq
+        self._hb_seq = (seq + 1) & 0xFF
+        if self._hb_pending.pop(seq, None) is not None:
+            self.heartbeats_missed += 1
+        self._hb_pending[seq] = self.now
+        self.heartbeats_sent += 1
+        if self._lost():
+            return
+        self._downlink_t = self._link_delay(self._downlink_t)
+        self._schedule(self._downlink_t, self.transport.notify, heartbeat_frame(seq))
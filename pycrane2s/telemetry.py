@@ -0,0 +1,159 @@
+"""
+Async telemetry stream for Crane2S.
+
+`async for sample in gimbal.telemetry(): ...` yields every decoded notification
+together with the monotonic time it arrived. The stream is backed by a bounded
+queue, so a slow consumer costs a fixed amount of memory; what happens when the
+queue is full is decided by the stream's policy. A blocking stream waits on its
+own worker task, so it never holds up other subscribers.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, NamedTuple
+
+from .decoder import FrameDecoder
+
+POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class TelemetrySample(NamedTuple):
+    monotonic_ns: int  # time.monotonic_ns() when the notification arrived
+    format_id: int
+    message: Any       # decoder message (CommandMessage, HeartbeatMessage or Message)
+
+
+class TelemetryStream:
+    """
+    Bounded queue of telemetry samples fed by a notification subscription.
+
+    Args:
+        maxsize: queue bound
+        policy: 'drop_oldest' discards the oldest queued sample to make room,
+            'drop_newest' discards the incoming one, 'block' makes delivery wait
+            for room. Blocking delivery runs on a worker task owned by the
+            stream, never inside the BLE callback, so heartbeat echoing and
+            other subscribers are unaffected; up to `max_pending` notifications
+            wait for it, beyond that the oldest is dropped.
+        format_ids: only keep samples with these format IDs (default: all)
+        arrival_ns: returns the arrival time of the notification being
+            delivered (default: `time.monotonic_ns`, read on delivery)
+        max_pending: bound of the 'block' policy's backlog of raw notifications
+    """
+    def __init__(self, maxsize: int = 256, policy: str = 'drop_oldest', format_ids=None,
+                 arrival_ns=None, max_pending: int = 256):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.format_ids = None if format_ids is None else frozenset(format_ids)
+        self._queue = deque()
+        self._decoder = FrameDecoder()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._subscription = None
+        self._arrival_ns = arrival_ns or time.monotonic_ns
+        # 'block' only: (arrival ns, raw notification) waiting for the stream's worker
+        self._pending = deque()
+        self.max_pending = max_pending
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task = None
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'queued': len(self._queue),
+            'pending': len(self._pending),
+            'decoder': self._decoder.stats,
+        }
+
+    def _samples(self, data, now: int):
+        wanted = self.format_ids
+        for msg in self._decoder.feed(data):
+            if wanted is None or msg.format_id in wanted:
+                self.received += 1
+                yield TelemetrySample(now, msg.format_id, msg)
+
+    def _push(self, data):
+        # Runs inline in the notification callback, so the arrival time is still current
+        now = self._arrival_ns()
+        if self.policy == 'block':
+            self._defer(now, data)
+            return
+        queue = self._queue
+        for sample in self._samples(data, now):
+            if len(queue) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == 'drop_newest':
+                    continue
+                queue.popleft()
+            queue.append(sample)
+        if queue:
+            self._ready.set()
+
+    def _defer(self, now: int, data):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append((now, bytes(data)))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run_blocking())
+        self._wakeup.set()
+
+    async def _run_blocking(self):
+        while not self.closed:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            now, data = self._pending.popleft()
+            for sample in self._samples(data, now):
+                while len(self._queue) >= self.maxsize and not self.closed:
+                    self._space.clear()
+                    await self._space.wait()
+                if self.closed:
+                    return
+                self._queue.append(sample)
+                self._ready.set()
+
+    async def get(self) -> TelemetrySample:
+        """Next sample; raises StopAsyncIteration once the stream is closed and drained."""
+        while not self._queue:
+            if self.closed:
+                raise StopAsyncIteration
+            self._ready.clear()
+            await self._ready.wait()
+        sample = self._queue.popleft()
+        self._space.set()
+        return sample
+
+    def close(self):
+        """Unsubscribe; samples already queued can still be read."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._subscription is not None:
+            self._subscription.cancel()
+        self._pending.clear()
+        self._ready.set()
+        self._space.set()
+        self._wakeup.set()
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        # Leaving the `async for` early closes the stream
+        try:
+            while True:
+                try:
+                    yield await self.get()
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.close()
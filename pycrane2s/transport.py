@@ -0,0 +1,296 @@
+"""
+Transports that carry Crane 2S packets.
+
+`Crane2S` only needs to write packets and receive notifications, so any link
+that can do both can drive a gimbal: BLE through bleak (the default), a wired
+UART bridge, UDP, or an in-memory loopback for simulations and benchmarks.
+Notification callbacks take `(sender, data)` like bleak's, and `data` is always
+one complete frame.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Callable
+
+from .decoder import FrameDecoder
+
+logger = logging.getLogger(__name__)
+
+NotifyCallback = Callable[[object, bytes], None]
+
+
+class Transport:
+    """
+    Interface of a packet transport.
+
+    Subclasses implement `connect`, `disconnect`, `write` and `is_connected`.
+    `write_many` defaults to one `write` per packet and notifications are
+    delivered to the callback stored by `start_notify`. Transports whose
+    `write_many` is cheaper than separate writes set `batch_writes`, and
+    `Crane2S` then hands them whole batches.
+    """
+    batch_writes = False
+
+    def __init__(self):
+        self._callback: NotifyCallback = None
+
+    @property
+    def is_connected(self) -> bool:
+        raise NotImplementedError
+
+    async def connect(self, timeout: float = 10.0):
+        raise NotImplementedError
+
+    async def disconnect(self):
+        raise NotImplementedError
+
+    async def write(self, pkt):
+        raise NotImplementedError
+
+    async def write_many(self, pkts):
+        """Write several packets back to back, in order."""
+        for pkt in pkts:
+            await self.write(pkt)
+
+    async def start_notify(self, callback: NotifyCallback):
+        self._callback = callback
+
+    async def stop_notify(self):
+        self._callback = None
+
+    def _deliver(self, data):
+        callback = self._callback
+        if callback is not None:
+            callback(self, data)
+
+
+class BleakTransport(Transport):
+    """BLE link through bleak: write-without-response and one notify characteristic."""
+    def __init__(self, address: str, write_uuid: str, notify_uuid: str = None):
+        super().__init__()
+        self.address = address
+        self.write_uuid = write_uuid
+        self.notify_uuid = notify_uuid
+        self.client = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client is not None and self.client.is_connected
+
+    async def connect(self, timeout: float = 10.0):
+        # bleak is only needed once we actually talk to a device
+        from bleak import BleakClient
+
+        self.client = BleakClient(self.address)
+        await self.client.connect(timeout=timeout)
+
+    async def disconnect(self):
+        if self.client is not None:
+            await self.client.disconnect()
+
+    async def write(self, pkt):
+        await self.client.write_gatt_char(self.write_uuid, pkt, response=False)
+
+    async def start_notify(self, callback: NotifyCallback):
+        # bleak already calls back with (sender, data); no wrapper needed
+        if self.notify_uuid:
+            await self.client.start_notify(self.notify_uuid, callback)
+
+    async def stop_notify(self):
+        if self.notify_uuid and self.is_connected:
+            await self.client.stop_notify(self.notify_uuid)
+
+
+class SerialTransport(Transport):
+    """
+    UART link on a raw, non-blocking file descriptor (POSIX, no pyserial).
+
+    The port is put in raw 8N1 mode at `baudrate`. Received bytes are
+    reassembled into frames before they reach the notification callback, and
+    `write_many` sends all packets with a single `os.write`.
+    """
+    batch_writes = True
+
+    def __init__(self, path: str, baudrate: int = 115200):
+        super().__init__()
+        self.path = path
+        self.baudrate = baudrate
+        self._fd: int = None
+        self._decoder = FrameDecoder()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._fd is not None
+
+    async def connect(self, timeout: float = 10.0):
+        import termios
+        import tty
+
+        speed = getattr(termios, f"B{self.baudrate}", None)
+        if speed is None:
+            raise ValueError(f"Unsupported baud rate {self.baudrate}")
+        fd = os.open(self.path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            if os.isatty(fd):
+                tty.setraw(fd)
+                attrs = termios.tcgetattr(fd)
+                attrs[2] |= termios.CLOCAL | termios.CREAD
+                attrs[4] = attrs[5] = speed
+                termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+        self._decoder.reset()
+        asyncio.get_running_loop().add_reader(fd, self._on_readable)
+
+    async def disconnect(self):
+        self._close()
+
+    def _close(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            asyncio.get_running_loop().remove_reader(fd)
+            os.close(fd)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.warning("Serial read on %s failed, closing the port: %s", self.path, e)
+            self._close()
+            return
+        if not data:
+            # EOF or hangup: the fd stays readable, so keeping the reader would spin the loop
+            logger.warning("Serial port %s hung up", self.path)
+            self._close()
+            return
+        for msg in self._decoder.feed(data):
+            self._deliver(bytes(msg.raw))
+
+    async def write(self, pkt):
+        if self._fd is None:
+            raise ConnectionError(f"Serial port {self.path} is not open")
+        view = memoryview(pkt)
+        while view:
+            try:
+                n = os.write(self._fd, view)
+            except BlockingIOError:
+                n = 0
+            view = view[n:]
+            if view:
+                await self._writable()
+
+    async def write_many(self, pkts):
+        await self.write(b"".join(pkts))
+
+    async def _writable(self):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        loop.add_writer(self._fd, lambda: fut.done() or fut.set_result(None))
+        try:
+            await fut
+        finally:
+            loop.remove_writer(self._fd)
+
+
+class _Datagrams(asyncio.DatagramProtocol):
+    def __init__(self, owner: "UdpTransport"):
+        self.owner = owner
+
+    def datagram_received(self, data, addr):
+        self.owner._deliver(data)
+
+    def error_received(self, exc):
+        logger.warning("UDP link to %s:%s: %s", self.owner.host, self.owner.port, exc)
+
+    def connection_lost(self, exc):
+        self.owner._endpoint = None
+
+
+class UdpTransport(Transport):
+    """
+    UDP link to a bridge: one packet per datagram in each direction.
+
+    Args:
+        host, port: the bridge
+        local_addr: optional (host, port) to bind, if the bridge replies to a fixed port
+    """
+    batch_writes = True
+
+    def __init__(self, host: str, port: int, local_addr: tuple = None):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.local_addr = local_addr
+        self._endpoint: asyncio.DatagramTransport = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._endpoint is not None
+
+    async def connect(self, timeout: float = 10.0):
+        loop = asyncio.get_running_loop()
+        self._endpoint, _ = await asyncio.wait_for(
+            loop.create_datagram_endpoint(
+                lambda: _Datagrams(self), remote_addr=(self.host, self.port), local_addr=self.local_addr),
+            timeout)
+
+    async def disconnect(self):
+        if self._endpoint is not None:
+            self._endpoint.close()
+            self._endpoint = None
+
+    def _connected_endpoint(self) -> asyncio.DatagramTransport:
+        if self._endpoint is None:
+            raise ConnectionError(f"UDP link to {self.host}:{self.port} is not connected")
+        return self._endpoint
+
+    async def write(self, pkt):
+        self._connected_endpoint().sendto(pkt)
+
+    async def write_many(self, pkts):
+        sendto = self._connected_endpoint().sendto
+        for pkt in pkts:
+            sendto(pkt)
+
+
+class LoopbackTransport(Transport):
+    """
+    In-memory transport for simulations, benchmarks and tests.
+
+    Every written packet is copied, kept in `written` (the last `keep`) and
+    passed to `on_write` if set, e.g. a simulated gimbal. `notify(data)` hands
+    a frame to the notification callback as if it came from the device.
+    """
+    batch_writes = True
+
+    def __init__(self, on_write: Callable[[bytes], None] = None, keep: int = 1024):
+        super().__init__()
+        self.on_write = on_write
+        self.written = deque(maxlen=keep)
+        self._connected = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def connect(self, timeout: float = 10.0):
+        self._connected = True
+
+    async def disconnect(self):
+        self._connected = False
+
+    async def write(self, pkt):
+        if not self._connected:
+            raise ConnectionError("Loopback transport is not connected")
+        pkt = bytes(pkt)
+        self.written.append(pkt)
+        if self.on_write is not None:
+            self.on_write(pkt)
+
+    def notify(self, data):
+        self._deliver(data)
@@ -0,0 +1,520 @@
+"""
+Single-writer send path for Crane2S.
+
+Every packet headed to the gimbal goes through one `PacketWriter` task, so only
+one write is ever in flight and bytes reach the radio in the order they were
+queued. Sequence numbers are assigned when a command is dequeued, which keeps
+them in wire order too.
+
+Besides the ordered queue the writer has a per-axis mailbox: posting a target
+for an axis overwrites any target still waiting for that axis, so a fast
+producer never builds up a backlog of stale commands.
+
+An emergency lane (`send_urgent`) flushes both and jumps ahead of everything.
+Heartbeat echoes have their own bounded lane that is served before the queue,
+so command load can neither starve them nor pile them up without limit.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from .Crane2SProtocol import PACKET_SIZE, Crane2SProtocol
+from .metrics import NULL_REGISTRY, Histogram, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Queue items are (raw, cmd_id, value, speed, future or None). `raw` is None to
+# encode the command or CACHED to look it up in the protocol's packet cache.
+# _STOP tells the writer task to finish. In a drained batch, a _MAILBOX item
+# stands for an axis whose mailbox target is read only when that item is written.
+CACHED = object()
+_STOP = object()
+_MAILBOX = object()
+
+
+class CommandDropped(Exception):
+    """A queued command was discarded by an emergency stop before it was written."""
+
+
+def _command(cmd_id, value, speed) -> tuple[int, int, int]:
+    # Validated before queueing, so a bad argument fails in the caller, not the writer task
+    cmd_id, value, speed = int(cmd_id), int(value), int(speed)
+    if not 0 <= cmd_id <= 0xFF:
+        raise ValueError(f"cmd_id must be 0-255, got {cmd_id}")
+    if not 0 <= value <= 0x0FFF:
+        raise ValueError(f"value must be 0-4095, got {value}")
+    return cmd_id, value, max(1, min(255, speed))
+
+
+def _retrieve(fut: asyncio.Future):
+    # Marks the outcome of a future nobody will await as retrieved
+    if not fut.cancelled():
+        fut.exception()
+
+
+def _abandon(futures, cancel: bool):
+    # The caller stops waiting: retrieve every outcome and, if the caller itself
+    # was cancelled, cancel what is still queued so no partial run with gaps goes out
+    for fut in futures:
+        if cancel:
+            fut.cancel()
+        fut.add_done_callback(_retrieve)
+
+
+async def _wait_all(futures, cancel: bool = True):
+    # Like gather(), every outcome is retrieved even after the first failure and
+    # cancelling the caller cancels all futures, but without gather's extra
+    # callback round trip per future
+    try:
+        for fut in futures:
+            await fut
+    except asyncio.CancelledError:
+        _abandon(futures, cancel)
+        raise
+    except BaseException:
+        _abandon(futures, False)
+        raise
+
+
+class PacketWriter:
+    """
+    Owns all writes to the gimbal.
+
+    Args:
+        write: coroutine function taking one packet (bytes-like) and writing it
+        protocol: encoder used for queued commands; owns the sequence counter
+        maxsize: queue bound. `send` waits while the queue is full (backpressure)
+        max_batch: how many queued items are drained from the queue in one go
+        max_heartbeats: bound of the heartbeat echo lane; the oldest echo is
+            dropped when a new one arrives while it is full
+        metrics, labels: registry (and labels) to export writer metrics to;
+            with no registry, writes are not timed at all
+        write_many: optional coroutine function taking a list of packets. When
+            given, each drained batch is handed to the link in one call instead
+            of one `write` per packet; heartbeats are then served between
+            batches rather than between packets
+    """
+    def __init__(self, write, protocol: Crane2SProtocol, maxsize: int = 64, max_batch: int = 16,
+                 max_heartbeats: int = 8, metrics: MetricsRegistry = None, labels: dict = None,
+                 write_many=None):
+        self._write = write
+        self._write_many = write_many
+        self.protocol = protocol
+        self.maxsize = maxsize
+        self.max_batch = max_batch
+        self._queue = deque()
+        # cmd_id -> (value, speed, cached), latest value wins
+        self._mailbox: dict[int, tuple[int, int, bool]] = {}
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: asyncio.Task = None
+        # Emergency lane: (request time ns, queue item), always written first
+        self._urgent = deque()
+        # Heartbeat echo lane of (packet, receive time ns), written before queued commands
+        self._heartbeats = deque()
+        self.max_heartbeats = max_heartbeats
+        # True while a write is in flight
+        self._busy = False
+        # One packet buffer, reused for every write
+        self._view = memoryview(bytearray(PACKET_SIZE))
+
+        # Mailbox counters
+        self.posted = 0
+        self.coalesced = 0
+        self.mailbox_sent = 0
+        self.mailbox_dropped = 0
+        # Emergency lane counters (latencies in ns)
+        self.urgent_count = 0
+        self.urgent_latency_last = 0
+        self.urgent_latency_max = 0
+        # Heartbeat echo counters
+        self.heartbeats_sent = 0
+        self.heartbeats_failed = 0
+        self.heartbeats_delayed = 0
+        self.heartbeats_dropped = 0
+        # Heartbeat receipt to echo write completion, ns
+        self.heartbeat_latency = Histogram()
+
+        metrics = metrics or NULL_REGISTRY
+        if metrics.enabled:
+            self._register_metrics(metrics, labels)
+
+    def _register_metrics(self, metrics: MetricsRegistry, labels: dict):
+        written = metrics.counter('crane2s_packets_written_total', "Packets handed to the link", labels)
+        latency = metrics.histogram('crane2s_write_seconds', "Duration of a single link write", labels)
+        write = self._write
+
+        # Only wrapped when metrics are on, so the disabled path has no timing calls
+        async def timed_write(pkt):
+            t0 = time.monotonic_ns()
+            await write(pkt)
+            latency.record(time.monotonic_ns() - t0)
+            written.inc()
+
+        self._write = timed_write
+        if self._write_many is not None:
+            write_many = self._write_many
+
+            async def timed_write_many(pkts):
+                t0 = time.monotonic_ns()
+                await write_many(pkts)
+                latency.record(time.monotonic_ns() - t0)
+                written.inc(len(pkts))
+
+            self._write_many = timed_write_many
+        metrics.gauge('crane2s_queue_depth', "Commands waiting in the send queue", labels,
+                      fn=lambda: len(self._queue))
+        metrics.counter('crane2s_mailbox_posted_total', "Mailbox targets posted", labels,
+                        fn=lambda: self.posted)
+        metrics.counter('crane2s_mailbox_coalesced_total', "Mailbox targets overwritten before being sent",
+                        labels, fn=lambda: self.coalesced)
+        metrics.counter('crane2s_heartbeat_echoes_total', "Heartbeat echoes written", labels,
+                        fn=lambda: self.heartbeats_sent)
+        metrics.counter('crane2s_heartbeat_echo_failures_total', "Heartbeat echo writes that failed", labels,
+                        fn=lambda: self.heartbeats_failed)
+        metrics.counter('crane2s_heartbeat_echo_drops_total', "Heartbeat echoes dropped from a full lane",
+                        labels, fn=lambda: self.heartbeats_dropped)
+        metrics.histogram('crane2s_heartbeat_echo_seconds', "Heartbeat receipt to echo write completion",
+                          labels, histogram=self.heartbeat_latency)
+        metrics.counter('crane2s_emergency_stops_total', "Emergency stops written", labels,
+                        fn=lambda: self.urgent_count)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self) -> int:
+        """Number of queued items waiting to be written."""
+        return len(self._queue)
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        """Write everything already queued, then stop the writer task."""
+        if not self.running:
+            return
+        self._queue.append(_STOP)
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def send(self, cmd_id: int, value: int, speed: int, cached: bool = False):
+        """Queue one command and wait until it has been written."""
+        await self.send_many([(cmd_id, value, speed)], cached)
+
+    async def send_many(self, cmds, cached: bool = False):
+        """
+        Queue several (cmd_id, value, speed) commands back to back and wait for all of them.
+
+        With `cached=True` packets come from `Crane2SProtocol.cached_cmd`; use it
+        for commands that repeat constantly.
+        """
+        if not self.running:
+            raise ConnectionError("Writer is not running")
+        cmds = [_command(*cmd) for cmd in cmds]
+        loop = asyncio.get_running_loop()
+        futures = []
+        try:
+            for cmd_id, value, speed in cmds:
+                while len(self._queue) >= self.maxsize:
+                    self._space.clear()
+                    await self._space.wait()
+                    # Shutdown wakes waiters too; don't queue behind a dead writer
+                    if not self.running:
+                        raise ConnectionError("Writer stopped")
+                fut = loop.create_future()
+                self._queue.append((CACHED if cached else None, cmd_id, value, speed, fut))
+                self._wakeup.set()
+                futures.append(fut)
+        except asyncio.CancelledError:
+            _abandon(futures, True)
+            raise
+        except BaseException:
+            _abandon(futures, False)
+            raise
+        await _wait_all(futures)
+
+    async def send_urgent(self, cmds, cached: bool = False):
+        """
+        Emergency lane: drop all queued commands and mailbox targets, then write
+        `cmds` ahead of everything else and wait for them.
+
+        Only a write already in flight is allowed to finish first. Dropped
+        commands fail with `CommandDropped` in their waiters. Heartbeat echoes
+        stay queued.
+        """
+        if not self.running:
+            raise ConnectionError("Writer is not running")
+        cmds = [_command(*cmd) for cmd in cmds]
+        requested_ns = time.perf_counter_ns()
+        stopping = _STOP in self._queue
+        self._discard(item for item in self._queue if item is not _STOP)
+        self._queue.clear()
+        if stopping:
+            self._queue.append(_STOP)
+        self.clear_mailbox()
+        self._space.set()
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for cmd_id, value, speed in cmds:
+            fut = loop.create_future()
+            # Only the first packet carries the request time; that's the latency we report
+            item = (CACHED if cached else None, cmd_id, value, speed, fut)
+            self._urgent.append((None if futures else requested_ns, item))
+            futures.append(fut)
+        self._wakeup.set()
+        # A stop goes out even if whoever asked for it is cancelled meanwhile
+        await _wait_all(futures, cancel=False)
+
+    @property
+    def urgent_stats(self) -> dict:
+        """Latency from `send_urgent` being called to its first packet being handed to the link, in seconds."""
+        return {
+            'count': self.urgent_count,
+            'latency_last': self.urgent_latency_last / 1e9,
+            'latency_max': self.urgent_latency_max / 1e9,
+        }
+
+    def echo_heartbeat(self, pkt, received_ns: int = None) -> bool:
+        """
+        Queue a heartbeat echo on the high-priority lane (usable from sync callbacks).
+
+        `received_ns` is the `time.monotonic_ns()` the heartbeat arrived at (now
+        if omitted); the time until the echo write completes is recorded in
+        `heartbeat_latency`. Echoes that have to wait for a write in flight are
+        counted as delayed. Returns False if the writer is not running.
+        """
+        if not self.running:
+            return False
+        if len(self._heartbeats) >= self.max_heartbeats:
+            self._heartbeats.popleft()
+            self.heartbeats_dropped += 1
+        if self._busy:
+            self.heartbeats_delayed += 1
+        self._heartbeats.append((bytes(pkt), time.monotonic_ns() if received_ns is None else received_ns))
+        self._wakeup.set()
+        return True
+
+    @property
+    def heartbeat_stats(self) -> dict:
+        return {
+            'sent': self.heartbeats_sent,
+            'failed': self.heartbeats_failed,
+            'delayed': self.heartbeats_delayed,
+            'dropped': self.heartbeats_dropped,
+            'pending': len(self._heartbeats),
+        }
+
+    def post(self, cmd_id: int, value: int, speed: int, cached: bool = False):
+        """
+        Set the pending target for one axis without waiting.
+
+        If a target for `cmd_id` has not been sent yet it is replaced (counted in
+        `coalesced`). Pending targets go out right after the next batch of queued
+        commands and are read at the moment they are written, so each write
+        carries the freshest value the link can take.
+        """
+        cmd_id, value, speed = _command(cmd_id, value, speed)
+        if cmd_id in self._mailbox:
+            self.coalesced += 1
+        self._mailbox[cmd_id] = (value, speed, cached)
+        self.posted += 1
+        self._wakeup.set()
+
+    def clear_mailbox(self):
+        """Discard all pending mailbox targets."""
+        self.mailbox_dropped += len(self._mailbox)
+        self._mailbox.clear()
+
+    @property
+    def mailbox_stats(self) -> dict:
+        return {
+            'posted': self.posted,
+            'coalesced': self.coalesced,
+            'sent': self.mailbox_sent,
+            'dropped': self.mailbox_dropped,
+            'pending': len(self._mailbox),
+        }
+
+    def _take_batch(self) -> tuple[list, bool]:
+        batch = []
+        queue = self._queue
+        while queue and len(batch) < self.max_batch:
+            item = queue.popleft()
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        # Mailbox targets ride along after the ordered commands. Only a slot per
+        # axis is taken here; a target posted while the batch is written still wins.
+        for cmd_id in self._mailbox:
+            batch.append((_MAILBOX, cmd_id, 0, 0, None))
+        return batch, False
+
+    def _from_mailbox(self, cmd_id: int):
+        # Queue item for the current target of `cmd_id`, or None if it was dropped
+        target = self._mailbox.pop(cmd_id, None)
+        if target is None:
+            return None
+        value, speed, cached = target
+        return (CACHED if cached else None, cmd_id, value, speed, None)
+
+    async def _run(self):
+        try:
+            while True:
+                if not (self._queue or self._mailbox or self._urgent or self._heartbeats):
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                if self._urgent:
+                    await self._write_urgent()
+                    continue
+                if self._heartbeats:
+                    await self._write_heartbeats()
+                    continue
+                batch, stopping = self._take_batch()
+                self._space.set()
+                await self._write_batch(batch)
+                if stopping:
+                    return
+        finally:
+            self._fail_pending()
+
+    async def _write_one(self, raw, cmd_id, value, speed, fut):
+        self._busy = True
+        try:
+            # Encoding happens right before the write, so seq follows wire order
+            if raw is None:
+                self.protocol.encode_into(self._view, 0, cmd_id, value, speed)
+                raw = self._view
+            elif raw is CACHED:
+                raw = self.protocol.cached_cmd(cmd_id, value, speed)
+            await self._write(raw)
+        except Exception as e:
+            self._fail(fut, e)
+            return False
+        finally:
+            self._busy = False
+        if fut is not None and not fut.done():
+            fut.set_result(None)
+        return True
+
+    async def _write_batch(self, batch):
+        if self._write_many is not None and len(batch) > 1:
+            await self._write_batch_many(batch)
+            return
+        for i, item in enumerate(batch):
+            if self._heartbeats:
+                await self._write_heartbeats()
+            if self._urgent:
+                # An emergency stop arrived mid-batch (maybe during an echo): abandon the rest
+                self._discard(batch[i:])
+                return
+            if item[0] is _MAILBOX:
+                item = self._from_mailbox(item[1])
+                if item is None:
+                    continue
+            fut = item[4]
+            if fut is not None and fut.done():
+                continue
+            if await self._write_one(*item) and fut is None:
+                self.mailbox_sent += 1
+
+    async def _write_batch_many(self, batch):
+        # Encode the whole batch into one buffer (seq in wire order), then one link call
+        buf = bytearray(len(batch) * PACKET_SIZE)
+        mv = memoryview(buf)
+        pkts, items = [], []
+        for item in batch:
+            if item[0] is _MAILBOX:
+                item = self._from_mailbox(item[1])
+                if item is None:
+                    continue
+            raw, cmd_id, value, speed, fut = item
+            if fut is not None and fut.done():
+                continue
+            try:
+                if raw is None:
+                    offset = len(pkts) * PACKET_SIZE
+                    self.protocol.encode_into(buf, offset, cmd_id, value, speed)
+                    raw = mv[offset:offset + PACKET_SIZE]
+                elif raw is CACHED:
+                    raw = self.protocol.cached_cmd(cmd_id, value, speed)
+            except Exception as e:
+                self._fail(fut, e)
+                continue
+            pkts.append(raw)
+            items.append(item)
+        if not pkts:
+            return
+        self._busy = True
+        try:
+            await self._write_many(pkts)
+        except Exception as e:
+            # The link may have taken part of the batch; report all of it as failed
+            for item in items:
+                self._fail(item[4], e)
+            return
+        finally:
+            self._busy = False
+        for raw, cmd_id, value, speed, fut in items:
+            if fut is None:
+                self.mailbox_sent += 1
+            elif not fut.done():
+                fut.set_result(None)
+
+    @staticmethod
+    def _fail(fut, e: Exception):
+        if fut is None:
+            logger.warning("Write failed: %r", e)
+        elif not fut.done():
+            fut.set_exception(e)
+
+    async def _write_urgent(self):
+        while self._urgent:
+            requested_ns, item = self._urgent.popleft()
+            if requested_ns is not None:
+                latency = time.perf_counter_ns() - requested_ns
+                self.urgent_count += 1
+                self.urgent_latency_last = latency
+                if latency > self.urgent_latency_max:
+                    self.urgent_latency_max = latency
+            await self._write_one(*item)
+
+    async def _write_heartbeats(self):
+        while self._heartbeats and not self._urgent:
+            pkt, received_ns = self._heartbeats.popleft()
+            self._busy = True
+            try:
+                await self._write(pkt)
+            except Exception as e:
+                self.heartbeats_failed += 1
+                logger.warning("Heartbeat echo failed: %r", e)
+            else:
+                self.heartbeats_sent += 1
+                self.heartbeat_latency.record(time.monotonic_ns() - received_ns)
+            finally:
+                self._busy = False
+
+    def _discard(self, items):
+        # Mailbox slots need nothing here: their targets are counted by clear_mailbox()
+        for raw, cmd_id, value, speed, fut in items:
+            if fut is not None and not fut.done():
+                # Not cancel(): that would look like the waiting task itself was cancelled
+                fut.set_exception(CommandDropped("Dropped by an emergency stop"))
+
+    def _fail_pending(self):
+        # Anything left (e.g. queued behind the stop marker) is failed, not written
+        while self._urgent:
+            self._queue.appendleft(self._urgent.pop()[1])
+        while self._queue:
+            item = self._queue.popleft()
+            if item is not _STOP and item[4] is not None and not item[4].done():
+                item[4].set_exception(ConnectionError("Writer stopped"))
+        self.clear_mailbox()
+        self.heartbeats_dropped += len(self._heartbeats)
+        self._heartbeats.clear()
+        self._space.set()
@@ -0,0 +1,104 @@
+import pytest
+
+from pycrane2s import Crane2SProtocol
+from pycrane2s.crc import crc16_xmodem
+from pycrane2s.decoder import CommandMessage, FrameDecoder, HeartbeatMessage, Message
+from pycrane2s.sim import heartbeat_frame
+
+
+def _commands(n):
+    p = Crane2SProtocol()
+    return [p.build_cmd(0x02, 100 + i, 10) for i in range(n)]
+
+
+def test_frame_split_across_feeds():
+    pkt = _commands(1)[0]
+    d = FrameDecoder()
+    for cut in (1, 2, 3, 4, 6, 13):
+        assert d.feed(pkt[:cut]) == []
+        assert d.stats['pending_bytes'] == cut
+        [msg] = d.feed(pkt[cut:])
+        assert isinstance(msg, CommandMessage)
+        assert (msg.cmd_id, msg.value, msg.speed) == (0x02, 100, 10)
+        assert bytes(msg.raw) == pkt
+    assert d.stats == {'frames': 6, 'crc_errors': 0, 'garbage_bytes': 0, 'pending_bytes': 0}
+
+
+def test_byte_at_a_time():
+    pkts = _commands(3) + [heartbeat_frame(7)]
+    d = FrameDecoder()
+    out = []
+    for b in b"".join(pkts):
+        out += d.feed(bytes([b]))
+    assert [bytes(m.raw) for m in out] == pkts
+    assert d.frames == 4 and d.garbage_bytes == 0
+
+
+def test_several_frames_in_one_feed():
+    pkts = _commands(3) + [heartbeat_frame(7)]
+    d = FrameDecoder()
+    out = d.feed(b"".join(pkts))
+    assert [m.seq for m in out] == [0, 1, 2, 7]
+    assert isinstance(out[3], HeartbeatMessage)
+    assert d.stats == {'frames': 4, 'crc_errors': 0, 'garbage_bytes': 0, 'pending_bytes': 0}
+
+
+def test_sync_byte_at_the_end_of_a_feed_is_kept():
+    pkt = _commands(1)[0]
+    d = FrameDecoder()
+    assert d.feed(b"\x00\x01\x24") == []
+    assert d.stats['pending_bytes'] == 1
+    assert d.garbage_bytes == 2
+    [msg] = d.feed(pkt[1:])
+    assert bytes(msg.raw) == pkt
+    assert d.garbage_bytes == 2 and d.frames == 1
+
+
+def test_crc_error_then_resync():
+    bad, good = _commands(2)
+    bad = bad[:-1] + bytes([bad[-1] ^ 0xFF])
+    d = FrameDecoder()
+    [msg] = d.feed(bad + good)
+    assert bytes(msg.raw) == good
+    assert d.crc_errors == 1
+    # Everything of the bad frame but its first byte (counted by the CRC error) is skipped
+    assert d.garbage_bytes == len(bad) - 1
+    assert d.frames == 1 and d.stats['pending_bytes'] == 0
+
+
+@pytest.mark.parametrize('length', [0, 1, 65, 0xFFFF])
+def test_out_of_range_length_is_skipped(length):
+    good = _commands(1)[0]
+    header = b"\x24\x3C" + length.to_bytes(2, 'little')
+    d = FrameDecoder()
+    [msg] = d.feed(header + good)
+    assert bytes(msg.raw) == good
+    assert d.garbage_bytes == len(header)
+    assert d.crc_errors == 0 and d.stats['pending_bytes'] == 0
+
+
+def test_leading_garbage_is_counted_and_skipped():
+    pkt = _commands(1)[0]
+    d = FrameDecoder()
+    [msg] = d.feed(b"\x00\x3C\x24\xFF\x12" + pkt)
+    assert bytes(msg.raw) == pkt
+    assert d.garbage_bytes == 5
+    assert d.feed(b"\x99" * 10) == []
+    assert d.garbage_bytes == 15 and d.stats['pending_bytes'] == 0
+
+
+def test_unknown_format_becomes_a_generic_message():
+    body = b"\x18\x99abc"
+    frame = b"\x24\x3C" + len(body).to_bytes(2, 'little') + body + crc16_xmodem(body).to_bytes(2, 'little')
+    [msg] = FrameDecoder().feed(frame)
+    assert isinstance(msg, Message)
+    assert msg.format_id == 0x1899 and bytes(msg.payload) == b"abc"
+
+
+def test_reset_drops_a_partial_frame():
+    pkt = _commands(1)[0]
+    d = FrameDecoder()
+    d.feed(pkt[:5])
+    d.reset()
+    assert d.feed(pkt[5:]) == []
+    assert d.stats['pending_bytes'] == 0
@@ -0,0 +1,29 @@
+import asyncio
+
+from pycrane2s import Crane2S, Crane2SFleet, LoopbackTransport
+
+
+def test_send_error_clears_after_success():
+    async def main():
+        transports = [LoopbackTransport() for _ in range(2)]
+        fleet = Crane2SFleet({f"u{i}": Crane2S(f"u{i}", transport=t) for i, t in enumerate(transports)})
+        assert await fleet.connect() == {}
+        good_write = transports[1].write
+
+        async def failing_write(pkt):
+            raise OSError("link glitch")
+
+        transports[1].write = failing_write
+        failed = await fleet.broadcast(0x02, 100, 10)
+        assert list(failed) == ['u1']
+        assert fleet.health()['u1']['error'] is not None
+
+        transports[1].write = good_write
+        assert await fleet.broadcast(0x02, 100, 10) == {}
+        health = fleet.health()
+        assert health['u1']['error'] is None
+        assert health['u1']['send_failures'] == 1
+        assert health['u0']['queue_depth'] == 0
+        await fleet.disconnect()
+
+    asyncio.run(main())
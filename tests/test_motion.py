@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from pycrane2s.clock import run_virtual
+from pycrane2s.motion import MotionDriver
+from pycrane2s.scheduler import TickScheduler
+
+
+def _driver(rate_hz=5.0, policy='skip'):
+    # Records every post as (virtual time, cmd_id, value, speed)
+    loop = asyncio.get_running_loop()
+    sent = []
+    driver = MotionDriver(TickScheduler(rate_hz, policy),
+                          lambda *cmd: sent.append((round(loop.time(), 9),) + cmd))
+    return driver, sent
+
+
+def test_pan_for_one_second_ticks_five_times_and_completes_on_time():
+    async def main():
+        driver, sent = _driver()
+        handle = driver.start(0x02, 3000, 10, 1.0)
+        assert await handle is True
+        assert asyncio.get_running_loop().time() == pytest.approx(1.0)
+        assert not handle.cancelled()
+        await asyncio.sleep(1.0)  # nothing more once the motion ended
+        assert driver._task.done()
+        return sent
+
+    sent = run_virtual(main())
+    assert [t for t, *_ in sent] == pytest.approx([0.0, 0.2, 0.4, 0.6, 0.8])
+    assert {tuple(cmd) for _, *cmd in sent} == {(0x02, 3000, 10)}
+
+
+def test_new_motion_preempts_the_one_on_the_same_axis():
+    async def main():
+        driver, sent = _driver()
+        first = driver.start(0x02, 3000, 10, None)
+        tilt = driver.start(0x01, 1000, 5, 1.0)
+        await asyncio.sleep(0.3)
+        second = driver.start(0x02, 1000, 20, 0.5)
+        assert await first is False
+        assert first.cancelled()
+        assert asyncio.get_running_loop().time() == pytest.approx(0.3)
+        assert await second is True
+        assert asyncio.get_running_loop().time() == pytest.approx(0.8)
+        assert not tilt.done()  # other axes are untouched
+        await tilt
+        return sent
+
+    sent = run_virtual(main())
+    pans = [(t, value) for t, cmd_id, value, _ in sent if cmd_id == 0x02]
+    assert pans == [(0.0, 3000), (0.2, 3000), (0.3, 1000), (0.4, 1000), (0.6, 1000)]
+    assert [t for t, cmd_id, *_ in sent if cmd_id == 0x01] == pytest.approx([0.0, 0.2, 0.4, 0.6, 0.8])
+
+
+def test_update_sends_right_away_and_restarts_the_duration():
+    async def main():
+        driver, sent = _driver()
+        handle = driver.start(0x02, 3000, 10, 1.0)
+        await asyncio.sleep(0.5)
+        handle.update(value=1000, duration=1.0)
+        assert sent[-1] == (0.5, 0x02, 1000, 10)
+        assert await handle is True
+        assert asyncio.get_running_loop().time() == pytest.approx(1.5)
+        with pytest.raises(RuntimeError):
+            handle.update(value=2000)
+        return sent
+
+    sent = run_virtual(main())
+    assert [(t, value) for t, _, value, _ in sent] == [
+        (0.0, 3000), (0.2, 3000), (0.4, 3000), (0.5, 1000),
+        (0.6, 1000), (0.8, 1000), (1.0, 1000), (1.2, 1000), (1.4, 1000)]
+
+
+def test_cancel_ends_the_motion_and_the_tick_loop():
+    async def main():
+        driver, sent = _driver()
+        handle = driver.start(0x02, 3000, 10, None)
+        await asyncio.sleep(0.5)
+        handle.cancel()
+        assert await handle is False
+        await asyncio.sleep(1.0)
+        assert driver._task.done()
+        return sent
+
+    sent = run_virtual(main())
+    assert [t for t, *_ in sent] == pytest.approx([0.0, 0.2, 0.4])
+
+
+def _late_ticks(policy):
+    # One consumer stall of 0.5 s on the first tick of a 1 s, 5 Hz run
+    async def main():
+        loop = asyncio.get_running_loop()
+        scheduler = TickScheduler(5.0, policy)
+        ticks = []
+        async for k in scheduler.ticks_for(1.0):
+            ticks.append((k, round(loop.time(), 9)))
+            if k == 0:
+                await asyncio.sleep(0.5)
+        return ticks, scheduler.stats, loop.time()
+
+    return run_virtual(main())
+
+
+def test_skip_policy_drops_missed_ticks():
+    ticks, stats, end = _late_ticks('skip')
+    assert ticks == [(0, 0.0), (2, 0.5), (3, 0.6), (4, 0.8)]
+    assert stats['missed'] == 1 and stats['ticks'] == 4
+    assert end == pytest.approx(1.0)
+
+
+def test_catch_up_policy_runs_missed_ticks_back_to_back():
+    ticks, stats, end = _late_ticks('catch_up')
+    assert ticks == [(0, 0.0), (1, 0.5), (2, 0.5), (3, 0.6), (4, 0.8)]
+    assert stats['missed'] == 0 and stats['ticks'] == 5
+    assert stats['jitter_max'] == pytest.approx(0.3)
+    assert end == pytest.approx(1.0)
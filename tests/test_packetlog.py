@@ -0,0 +1,23 @@
+import logging
+import logging.handlers
+
+from pycrane2s import PacketLog
+
+
+def test_deferred_formatting_sees_each_packet():
+    logger = logging.getLogger('test.packetlog')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    target = logging.handlers.BufferingHandler(100)
+    handler = logging.handlers.MemoryHandler(100, target=target)
+    logger.addHandler(handler)
+    try:
+        log = PacketLog(logger)
+        buf = bytearray(2)
+        for i in range(3):
+            buf[:] = bytes([i, i])
+            log.record('tx', memoryview(buf))
+        handler.flush()
+        assert [r.getMessage() for r in target.buffer] == ['tx 0000', 'tx 0101', 'tx 0202']
+    finally:
+        logger.removeHandler(handler)
@@ -0,0 +1,124 @@
+import importlib
+
+import pytest
+
+from pycrane2s import Crane2SProtocol
+
+# The package re-exports the class under the module's name, so fetch the module explicitly
+proto = importlib.import_module('pycrane2s.Crane2SProtocol')
+
+VALUES = [0, 1, 2047, 2048, 2049, 4094, 4095, 4096, 0xFFFF]
+SPEEDS = [-5, 0, 1, 2, 128, 254, 255, 256, 1000]
+CMD_IDS = [0x00, 0x01, 0x02, 0x03, 0xFF]
+
+
+def _crc_bitwise(data: bytes) -> int:
+    crc = 0x0000
+    for b in data:
+        crc ^= b << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if (crc & 0x8000) else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def reference_packet(seq: int, cmd_id: int, value: int, speed: int) -> bytes:
+    """The original bytearray/bitwise-CRC encoder."""
+    pkt = bytearray([0x24, 0x3C])
+    pkt += (8).to_bytes(2, 'little')
+    pkt += bytes.fromhex('1812')
+    pkt.append(seq & 0xFF)
+    pkt.append(0x01)
+    pkt.append(cmd_id & 0xFF)
+    pkt += (value & 0x0FFF).to_bytes(2, 'little')
+    pkt.append(max(1, min(255, speed)))
+    pkt += _crc_bitwise(bytes(pkt[4:])).to_bytes(2, 'little')
+    return bytes(pkt)
+
+
+@pytest.mark.parametrize('finalizer', sorted(proto.FINALIZERS))
+def test_every_seq_matches_reference(finalizer):
+    p = Crane2SProtocol(finalizer=finalizer)
+    for seq in range(256):
+        assert p.build_cmd(0x02, 3000, 10) == reference_packet(seq, 0x02, 3000, 10)
+    # The counter wraps back to 0
+    assert p.build_cmd(0x01, 0, 1) == reference_packet(0, 0x01, 0, 1)
+
+
+@pytest.mark.parametrize('finalizer', sorted(proto.FINALIZERS))
+def test_edge_values_and_speeds(finalizer):
+    buf = bytearray(proto.PACKET_SIZE)
+    encode = proto.FINALIZERS[finalizer]
+    for seq in (0, 1, 127, 128, 255):
+        for cmd_id in CMD_IDS:
+            for value in VALUES:
+                for speed in SPEEDS:
+                    encode(buf, 0, seq, cmd_id, value, speed)
+                    assert bytes(buf) == reference_packet(seq, cmd_id, value, speed), \
+                        (seq, cmd_id, value, speed)
+
+
+def test_cached_cmd_matches_reference():
+    p = Crane2SProtocol()
+    for seq in range(300):
+        assert p.cached_cmd(0x02, 2048, 1) == reference_packet(seq, 0x02, 2048, 1)
+
+
+def _expected_batch(seq0, cmds, values, speeds):
+    return b"".join(reference_packet(seq0 + i, c, v, s) for i, (c, v, s) in enumerate(zip(cmds, values, speeds)))
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+@pytest.mark.parametrize('n', [1, 31, 32, 300])
+def test_build_many(monkeypatch, use_numpy, n):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(proto, '_numpy', lambda: None)
+    cmds = [CMD_IDS[i % len(CMD_IDS)] for i in range(n)]
+    values = [VALUES[i % len(VALUES)] for i in range(n)]
+    speeds = [SPEEDS[i % len(SPEEDS)] for i in range(n)]
+    p = Crane2SProtocol()
+    p.build_cmd(0x02, 2048, 1)  # start from seq 1
+    batch = p.build_many(cmds, values, speeds)
+    assert bytes(batch) == _expected_batch(1, cmds, values, speeds)
+    # The sequence continues after the batch
+    assert p.build_cmd(0x01, 5, 5) == reference_packet(1 + n, 0x01, 5, 5)
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_build_many_broadcasts_scalars(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(proto, '_numpy', lambda: None)
+    values = list(range(0, 4096, 64))
+    batch = Crane2SProtocol().build_many(0x02, values, 10)
+    assert bytes(batch) == _expected_batch(0, [0x02] * len(values), values, [10] * len(values))
+
+
+def test_build_many_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        Crane2SProtocol().build_many([1, 2], [3], [4, 5])
+
+
+def test_cache_evicts_least_recently_used_and_keeps_reserved_keys():
+    p = Crane2SProtocol(max_cached=2)
+    p.cached_cmd(0x02, 100, 10)
+    p.cached_cmd(0x02, 200, 10)
+    p.cached_cmd(0x02, 100, 10)  # now most recently used
+    p.cached_cmd(0x02, 300, 10)
+    assert list(p._cache) == [(0x02, 100, 10), (0x02, 300, 10)]
+    for value in range(50):
+        p.cached_cmd(0x01, value, 5)
+    assert len(p._cache) == 2
+    seq = p._seq
+    assert p.cached_cmd(0x02, 2048, 1) == reference_packet(seq, 0x02, 2048, 1)
+    assert (0x02, 2048, 1) in p._pinned
+
+
+def test_warm_cache_builds_reserved_keys():
+    p = Crane2SProtocol()
+    p.warm_cache()
+    assert set(p._pinned) == set(proto.RESERVED_CACHE_KEYS)
+    assert not p._cache
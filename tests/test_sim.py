@@ -0,0 +1,31 @@
+import pytest
+
+from pycrane2s import Crane2SProtocol
+from pycrane2s.sim import Axis, SimulatedGimbal
+
+
+def test_axis_stops_when_a_step_ends_exactly_on_the_timeout():
+    sim = SimulatedGimbal(realtime=False, inertia=0, heartbeat_interval=None)
+    sim.start()
+    sim.receive(Crane2SProtocol().build_cmd(0x02, 0, 255))
+    for _ in range(8):
+        sim.advance(0.25)
+    assert sim.pan == pytest.approx(45.0)
+    assert sim.axes[0x02].rate == 0.0
+
+
+def test_heartbeats_dividing_the_timeout_do_not_keep_the_axis_moving():
+    sim = SimulatedGimbal(realtime=False, inertia=0, heartbeat_interval=0.125)
+    sim.start()
+    sim.receive(Crane2SProtocol().build_cmd(0x02, 0, 255))
+    sim.advance(2.0)
+    assert sim.pan == pytest.approx(45.0)
+
+
+def test_axis_step_starting_on_the_timeout_clears_the_target():
+    axis = Axis(max_rate=90.0, inertia=0)
+    axis.command(0, 255, now=0.0, timeout=0.5)
+    axis.step(0.0, 0.5)
+    axis.step(0.5, 1.0)
+    assert axis.angle == pytest.approx(45.0)
+    assert axis.target == 0.0
@@ -0,0 +1,33 @@
+import asyncio
+
+from pycrane2s import Crane2S, LoopbackTransport
+from pycrane2s.crc import crc16_xmodem
+
+
+def _heartbeat(seq: int) -> bytes:
+    body = bytes((0x18, 0x15, seq))
+    return b"\x24\x3C" + len(body).to_bytes(2, 'little') + body + crc16_xmodem(body).to_bytes(2, 'little')
+
+
+def test_blocking_stream_keeps_arrival_time_and_does_not_stall_others():
+    async def main():
+        transport = LoopbackTransport()
+        gimbal = Crane2S('test', transport=transport)
+        await gimbal.connect()
+        stream = gimbal.telemetry(maxsize=1, policy='block')
+        seen = []
+        gimbal.on(0x1815, seen.append, offload=True)
+
+        arrivals = []
+        for seq in range(5):
+            transport.notify(_heartbeat(seq))
+            arrivals.append(gimbal.last_notify_ns)
+            await asyncio.sleep(0.01)
+        # The stream is full and blocked, the other offloaded subscriber still got everything
+        assert len(seen) == 5
+        samples = [await stream.get() for _ in range(5)]
+        assert [s.message.seq for s in samples] == list(range(5))
+        assert [s.monotonic_ns for s in samples] == arrivals
+        await gimbal.disconnect()
+
+    asyncio.run(main())
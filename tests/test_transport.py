@@ -0,0 +1,67 @@
+import asyncio
+import os
+
+import pytest
+
+from pycrane2s import Crane2S, LoopbackTransport, SerialTransport, UdpTransport
+from pycrane2s.decoder import FrameDecoder
+
+
+def test_batches_go_through_write_many():
+    async def main():
+        transport = LoopbackTransport()
+        calls = []
+        write_many = transport.write_many
+
+        async def counting_write_many(pkts):
+            calls.append(len(pkts))
+            await write_many(pkts)
+
+        transport.write_many = counting_write_many
+        gimbal = Crane2S('test', transport=transport)
+        await gimbal.connect()
+        await gimbal.send_cmds([(0x02, i, 10) for i in range(20)])
+        await gimbal.disconnect()
+        return calls, list(transport.written)
+
+    calls, written = asyncio.run(main())
+    assert sum(calls) == 20 and max(calls) > 1
+    messages = FrameDecoder().feed(b"".join(written))
+    assert [m.seq for m in messages] == list(range(20))
+    assert [m.value for m in messages] == list(range(20))
+
+
+def test_udp_write_when_disconnected_raises_connection_error():
+    async def main():
+        with pytest.raises(ConnectionError):
+            await UdpTransport('127.0.0.1', 9).write(b"x")
+        with pytest.raises(ConnectionError):
+            await UdpTransport('127.0.0.1', 9).write_many([b"x"])
+
+    asyncio.run(main())
+
+
+def test_serial_hangup_closes_the_port_instead_of_spinning(monkeypatch):
+    pty = pytest.importorskip('pty')
+    read = os.read
+    reads = []
+
+    def counting_read(fd, n):
+        reads.append(fd)
+        return read(fd, n)
+
+    async def main():
+        master, slave = pty.openpty()
+        transport = SerialTransport(os.ttyname(slave))
+        await transport.connect()
+        os.close(slave)
+        monkeypatch.setattr(os, 'read', counting_read)
+        os.close(master)  # the far end goes away
+        await asyncio.sleep(0.05)
+        assert not transport.is_connected
+        assert len(reads) <= 2
+        with pytest.raises(ConnectionError):
+            await transport.write(b"x")
+        await transport.disconnect()
+
+    asyncio.run(main())
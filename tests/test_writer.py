@@ -0,0 +1,228 @@
+import asyncio
+
+import pytest
+
+from pycrane2s import CommandDropped, Crane2S, LoopbackTransport
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _connected(**kwargs):
+    transport = LoopbackTransport()
+    gimbal = Crane2S('test', transport=transport, **kwargs)
+    await gimbal.connect()
+    return gimbal, transport
+
+
+def test_bad_command_fails_in_caller_and_writer_survives():
+    async def main():
+        gimbal, transport = await _connected()
+        with pytest.raises(ValueError):
+            await gimbal.send_cmd(0x02, 5000, 10)
+        with pytest.raises(TypeError):
+            await gimbal.send_cmd(0x02, None, 10)
+        with pytest.raises(ValueError):
+            gimbal.post_cmd(0x100, 2048, 10)
+        with pytest.raises(ValueError):
+            gimbal.pan(-1, 10)
+        assert gimbal._writer.running
+        await asyncio.wait_for(gimbal.send_cmd(0x02, 2048.0, 10), 1)
+        assert len(transport.written) == 1
+        await gimbal.disconnect()
+
+    run(main())
+
+
+def test_encode_error_goes_to_caller():
+    async def main():
+        gimbal, _ = await _connected()
+
+        def broken(*args):
+            raise RuntimeError("encoder broke")
+
+        gimbal.protocol.encode_into = broken
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(gimbal.send_cmd(0x02, 100, 10), 1)
+        assert gimbal._writer.running
+        await gimbal.disconnect()
+
+    run(main())
+
+
+def test_disconnect_after_link_drop_stops_local_tasks():
+    async def main():
+        gimbal, transport = await _connected()
+        handle = gimbal.pan(3000, 10, None)
+        samples = []
+
+        async def consume():
+            async for sample in gimbal.telemetry():
+                samples.append(sample)
+
+        consumer = asyncio.get_running_loop().create_task(consume())
+        await asyncio.sleep(0)
+        await transport.disconnect()  # link drops underneath the client
+        await gimbal.disconnect()
+        assert not gimbal._writer.running
+        assert handle.done()
+        await asyncio.wait_for(consumer, 1)
+
+    run(main())
+
+
+def test_send_cmds_fails_when_writer_stops_while_waiting_for_space(caplog):
+    async def main():
+        transport = LoopbackTransport()
+        gimbal = Crane2S('test', transport=transport)
+        gimbal._writer.maxsize = 4
+        await gimbal.connect()
+
+        async def slow_write(pkt):
+            await asyncio.sleep(0.01)
+
+        transport.write = slow_write
+        sender = asyncio.get_running_loop().create_task(
+            gimbal.send_cmds([(0x02, i, 10) for i in range(20)]))
+        await asyncio.sleep(0.015)
+        await gimbal.disconnect()
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(sender, 1)
+
+    run(main())
+    assert 'never retrieved' not in caplog.text
+
+
+def test_stop_drops_queued_commands_without_cancelling_the_sender():
+    async def main():
+        gimbal, transport = await _connected()
+
+        async def slow_write(pkt):
+            await asyncio.sleep(0.01)
+
+        transport.write = slow_write
+        # More than one batch, so some commands are still queued when stop() arrives
+        sender = asyncio.get_running_loop().create_task(
+            gimbal.send_cmds([(0x02, i, 10) for i in range(50)]))
+        await asyncio.sleep(0.005)
+        await gimbal.stop()
+        with pytest.raises(CommandDropped):
+            await sender
+        assert not sender.cancelled()
+        await gimbal.disconnect()
+
+    run(main())
+
+
+def test_stop_keeps_pending_heartbeat_echoes():
+    async def main():
+        gimbal, transport = await _connected()
+
+        async def slow_write(pkt):
+            await asyncio.sleep(0.01)
+            transport.written.append(bytes(pkt))
+
+        transport.write = slow_write
+        gimbal.post_cmd(0x02, 100, 10)
+        await asyncio.sleep(0.001)  # the mailbox write is now in flight
+        heartbeat = bytes.fromhex('243c0400181505aaa2dd')
+        transport.notify(heartbeat)
+        transport.notify(heartbeat)
+        await gimbal.stop()
+        await asyncio.sleep(0.05)
+        assert gimbal.heartbeat_stats['dropped'] == 0
+        assert gimbal.heartbeat_stats['sent'] == 2
+        await gimbal.disconnect()
+
+    run(main())
+
+
+def test_cancelled_send_cmds_writes_none_of_the_queued_commands():
+    async def main():
+        gimbal, transport = await _connected()
+        write = transport.write
+        gate = asyncio.Event()
+
+        async def gated_write(pkt):
+            await gate.wait()
+            await write(pkt)
+
+        transport.write = gated_write
+        gimbal.post_cmd(0x01, 2048, 1)  # holds the writer in a write
+        await asyncio.sleep(0)
+        sender = asyncio.get_running_loop().create_task(
+            gimbal.send_cmds([(0x02, 10, 10), (0x02, 20, 10), (0x02, 30, 10)]))
+        await asyncio.sleep(0)
+        sender.cancel()
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await sender
+        await gimbal.send_cmd(0x03, 2048, 1)
+        await gimbal.disconnect()
+        return [pkt[8] for pkt in transport.written]
+
+    assert run(main()) == [0x01, 0x03]
+
+
+def test_mailbox_target_posted_during_a_batch_replaces_the_drained_one():
+    async def main():
+        transport = LoopbackTransport()
+        transport.batch_writes = False  # one write per packet
+        gimbal = Crane2S('test', transport=transport)
+        await gimbal.connect()
+        write = transport.write
+
+        async def slow_write(pkt):
+            await asyncio.sleep(0.01)
+            await write(pkt)
+
+        transport.write = slow_write
+        sender = asyncio.get_running_loop().create_task(
+            gimbal.send_cmds([(0x01, 2048, 1)] * 3))
+        await asyncio.sleep(0)  # the commands are queued
+        gimbal.post_cmd(0x02, 111, 10)
+        await asyncio.sleep(0.015)  # the batch with the pan slot is being written
+        gimbal.post_cmd(0x02, 222, 10)
+        await sender
+        await asyncio.sleep(0.03)
+        await gimbal.disconnect()
+        return gimbal.mailbox_stats, [int.from_bytes(pkt[9:11], 'little') for pkt in transport.written if pkt[8] == 0x02]
+
+    stats, pans = run(main())
+    assert pans == [222]
+    assert stats['coalesced'] == 1 and stats['sent'] == 1
+
+
+def test_stop_during_a_heartbeat_echo_goes_ahead_of_the_next_command():
+    heartbeat = bytes.fromhex('243c0400181505aaa2dd')
+
+    async def main():
+        transport = LoopbackTransport()
+        transport.batch_writes = False
+        gimbal = Crane2S('test', transport=transport)
+        await gimbal.connect()
+        write = transport.write
+        stopping = []
+
+        async def slow_write(pkt):
+            if bytes(pkt) == heartbeat and not stopping:
+                # stop() arrives while the echo is in flight
+                stopping.append(asyncio.get_running_loop().create_task(gimbal.stop()))
+            await asyncio.sleep(0.005)
+            await write(pkt)
+
+        transport.write = slow_write
+        sender = asyncio.get_running_loop().create_task(
+            gimbal.send_cmds([(0x02, i, 10) for i in range(3)]))
+        await asyncio.sleep(0.001)  # cmd0 is in flight
+        transport.notify(heartbeat)
+        with pytest.raises(CommandDropped):
+            await sender
+        await stopping[0]
+        await gimbal.disconnect()
+        return [bytes(pkt) for pkt in transport.written]
+
+    written = run(main())
+    assert written[1] == heartbeat
+    assert [(pkt[8], int.from_bytes(pkt[9:11], 'little')) for pkt in written[2:]] == [(0x02, 2048), (0x01, 2048)]